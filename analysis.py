@@ -0,0 +1,223 @@
+"""决策规则与报表生成 (纯计算，不访问网络，不依赖 Streamlit)"""
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# 不符合买入条件的理由，以位掩码存储 (每行 1 字节)，展示时再转换为文字
+REASON_PREMIUM_HIGH = 1
+REASON_BELOW_M20 = 2
+REASON_M20_DOWN = 4
+REASON_LOSS_CUT = 8
+REASON_NO_DATA = 16
+REASON_LABELS = {
+    REASON_PREMIUM_HIGH: "溢价高",
+    REASON_BELOW_M20: "低于M20",
+    REASON_M20_DOWN: "M20向下",
+    REASON_LOSS_CUT: "亏损超8%",
+    REASON_NO_DATA: "行情或K线获取失败",
+}
+
+# 报表中的数值列 (float64，缺失为 NaN) 及其文本格式
+NUMERIC_COLUMNS = ["溢价率", "现价", "估值", "周M20", "收益", "比对M20"]
+DISPLAY_FORMATS = {
+    "溢价率": "{:.3f}%",
+    "现价": "{:.3f}",
+    "估值": "{:.4f}",
+    "周M20": "{:.3f}",
+    "收益": "{:.2f}%",
+    "比对M20": "{:.2f}%",
+}
+
+def calc_premium(price, valuation):
+    """根据现价与估值计算溢价率 (%)"""
+    if price > 0 and valuation > 0:
+        return ((price - valuation) / valuation) * 100
+    return 0.0
+
+def reasons_text(flags):
+    """理由位掩码 → 文字，例如 3 → 溢价高，低于M20"""
+    return "，".join(label for bit, label in REASON_LABELS.items() if flags & bit)
+
+def reason_categories(flags):
+    """位掩码列 → 分类列：只为实际出现的组合生成一次文字"""
+    codes, uniques = pd.factorize(pd.Series(flags, dtype=np.uint8))
+    return pd.Categorical.from_codes(codes, [reasons_text(int(f)) for f in uniques])
+
+# === 历史周线向量化计算 ===
+
+def build_history_frame(hist_df, nav_map, cost, current_valuation):
+    """按整列计算全部历史周线的溢价、M20 与判定 (hist_df 按日期降序)"""
+    dates = hist_df['日期'].astype(str).str.split().str[0]
+    price = pd.to_numeric(hist_df['收盘'], errors='coerce')
+    m20 = pd.to_numeric(hist_df['M20'], errors='coerce')
+    # 降序排列，下一行即为上一周
+    prev_m20 = m20.shift(-1)
+
+    # 溢价率：优先用当日净值；最新一周若无净值记录则用实时估值
+    nav = pd.to_numeric(dates.map(nav_map), errors='coerce')
+    premium = ((price - nav) / nav * 100).where(nav > 0)
+    if len(premium) and current_valuation > 0 and dates.iloc[0] not in nav_map:
+        premium.iloc[0] = (price.iloc[0] - current_valuation) / current_valuation * 100
+
+    above_m20 = price > m20
+    m20_up = m20 > prev_m20
+    if cost > 0:
+        profit = (price - cost) / cost * 100
+        m20_diff = (m20 - cost) / cost * 100
+    else:
+        profit = pd.Series(np.nan, index=hist_df.index)
+        m20_diff = pd.Series(np.nan, index=hist_df.index)
+
+    premium_high = premium >= 1.0
+    loss_cut = profit <= -8.0
+    is_buy = ~premium_high & above_m20 & m20_up & ~loss_cut
+
+    reasons = np.zeros(len(hist_df), dtype=np.uint8)
+    for mask, bit in ((premium_high, REASON_PREMIUM_HIGH), (~above_m20, REASON_BELOW_M20),
+                      (~m20_up, REASON_M20_DOWN), (loss_cut, REASON_LOSS_CUT)):
+        reasons |= np.where(mask, bit, 0).astype(np.uint8)
+
+    return pd.DataFrame({
+        "时间": dates,
+        "溢价率": premium,
+        "现价": price,
+        "周M20": m20,
+        "在M20上": above_m20,
+        "M20向上": m20_up,
+        "收益": profit,
+        "比对M20": m20_diff,
+        "reasons": reasons,
+        "is_buy": is_buy,
+    })
+
+# === 报表类型与格式化 ===
+
+def finalize_report(frame):
+    """统一报表列类型：数值列 float64、判定 bool、type 与理由为分类列 (理由由位掩码转换)"""
+    frame = frame.astype({col: "float64" for col in NUMERIC_COLUMNS if col in frame})
+    frame["type"] = frame["type"].astype("category")
+    frame["理由"] = reason_categories(frame.pop("reasons"))
+    frame["is_buy"] = frame.pop("is_buy").astype(bool)
+    return frame
+
+def format_report(report):
+    """将数值报表格式化为文本 (命令行输出用；界面在展示时通过 column_config 格式化)"""
+    def fmt(series, pattern):
+        return series.map(lambda v: pattern.format(v) if pd.notna(v) else "-")
+
+    out = report.drop(columns=["type", "is_buy"])
+    for col, pattern in DISPLAY_FORMATS.items():
+        if col in out:
+            out[col] = fmt(out[col], pattern)
+    for col in ("在M20上", "M20向上"):
+        if col in out:
+            out[col] = out[col].map({True: "是", False: "否"}).astype(object).fillna("-")
+    out.insert(out.columns.get_loc("理由"), "判定", np.where(report["is_buy"], "符合条件", "不符合"))
+    return out
+
+# === 实时判定 ===
+
+def evaluate_realtime(price, premium, hist_df, cost, live_m20=None):
+    """按实时价格判定是否符合买入条件，返回 (周M20, 在M20上, M20向上, 可买入, 理由位掩码)
+
+    live_m20 为 (本周预估周M20, 上周M20) 时按“本周若以现价收盘”判定；
+    否则使用最后一根周线的 M20。
+    """
+    if live_m20 is not None:
+        latest_k_m20, prev_k_m20 = live_m20
+    else:
+        latest_k_m20 = float(hist_df.iloc[0]['M20'])
+        prev_k_m20 = float(hist_df.iloc[1]['M20'])
+    
+    is_above_m20 = price > latest_k_m20
+    is_m20_up = latest_k_m20 > prev_k_m20
+    
+    reasons = 0
+    if premium >= 1.0: reasons |= REASON_PREMIUM_HIGH
+    if not is_above_m20: reasons |= REASON_BELOW_M20
+    if not is_m20_up: reasons |= REASON_M20_DOWN
+    if cost > 0 and ((price - cost)/cost*100) <= -8.0: reasons |= REASON_LOSS_CUT
+    return latest_k_m20, is_above_m20, is_m20_up, reasons == 0, reasons
+
+def check_market_data(data):
+    """检查分析所需数据是否齐全，缺失时返回面向用户的错误提示，否则返回 None"""
+    if data["price"] == 0:
+        return "无法连接到行情服务器，请刷新页面重试 (可能因网络波动)。"
+    if data["kline"].empty:
+        return "K线数据获取失败，请稍后重试。"
+    return None
+
+def realtime_row(data, cost, live_m20=None):
+    """由行情快照生成实时判定行 (未定型的字典，见 finalize_report)"""
+    current_price = data["price"]
+    current_premium = calc_premium(current_price, data["valuation"])
+    latest_k_m20, is_above_m20, is_m20_up, can_buy, reasons = evaluate_realtime(current_price, current_premium, data["kline"], cost, live_m20)
+
+    return {
+        "type": "realtime",
+        "时间": f"{datetime.now().strftime('%m-%d %H:%M')} (实时)",
+        "溢价率": current_premium,
+        "现价": current_price,
+        "周M20": latest_k_m20,
+        "在M20上": is_above_m20,
+        "M20向上": is_m20_up,
+        "收益": (current_price - cost)/cost*100 if cost > 0 else np.nan,
+        "比对M20": (latest_k_m20 - cost)/cost*100 if cost > 0 else np.nan,
+        "reasons": reasons,
+        "is_buy": can_buy
+    }
+
+def build_realtime_report(data, cost, live_m20=None):
+    """只含实时行的报表 (实时模式下按报价频率刷新，不重算历史)"""
+    return finalize_report(pd.DataFrame([realtime_row(data, cost, live_m20)]))
+
+def build_report(data, cost, live_m20=None):
+    """由行情快照生成分析报表：第一行为实时判定，其后为全部历史周线 (数值列均为 float64)
+
+    live_m20 见 evaluate_realtime，实时行的周M20 为含现价的本周预估值。
+    """
+    rows = [realtime_row(data, cost, live_m20)]
+
+    # === 历史行 (全部周线) ===
+    hist_rows = build_history_frame(data["kline"], data["nav"], cost, data["valuation"]).assign(type="history")
+
+    return finalize_report(pd.concat([pd.DataFrame(rows), hist_rows], ignore_index=True))
+
+# === 自选列表 ===
+
+def parse_watchlist(text):
+    """从输入文本中提取 6 位基金代码 (去重并保持顺序)"""
+    return list(dict.fromkeys(re.findall(r"\d{6}", text)))
+
+def build_watchlist_report(codes, results, live_m20=None):
+    """由 fetch_watchlist 的结果生成每只基金的实时判定汇总 (live_m20: {代码: (预估周M20, 上周M20)})"""
+    live_m20 = live_m20 or {}
+    prices = results["prices"] or {}
+    valuations = results["valuations"] or {}
+    rows = []
+    for code in codes:
+        price = prices.get(code, 0.0)
+        valuation = valuations.get(code, 0.0)
+        hist_df = results[("kline", code)]
+        if price == 0 or hist_df is None or len(hist_df) < 2:
+            rows.append({"type": "watchlist", "代码": code, "现价": price, "估值": valuation, "溢价率": np.nan,
+                         "周M20": np.nan, "在M20上": None, "M20向上": None, "reasons": REASON_NO_DATA, "is_buy": False})
+            continue
+        premium = calc_premium(price, valuation)
+        latest_k_m20, is_above_m20, is_m20_up, can_buy, reasons = evaluate_realtime(price, premium, hist_df, 0, live_m20.get(code))
+        rows.append({
+            "type": "watchlist",
+            "代码": code,
+            "现价": price,
+            "估值": valuation,
+            "溢价率": premium if valuation > 0 else np.nan,
+            "周M20": latest_k_m20,
+            "在M20上": is_above_m20,
+            "M20向上": is_m20_up,
+            "reasons": reasons,
+            "is_buy": can_buy
+        })
+    # 数据缺失的基金没有均线判定，用可空布尔表示
+    return finalize_report(pd.DataFrame(rows)).astype({"在M20上": "boolean", "M20向上": "boolean"})
@@ -1,13 +1,22 @@
+import time
+
 import streamlit as st
 import pandas as pd
-import akshare as ak
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from datetime import datetime
-import time
-import re
-import json
+
+from analysis import build_realtime_report, build_report, build_watchlist_report, check_market_data, parse_watchlist
+from backtest import backtest, prepare_history
+from breaker import CLOSED, breaker_states
+from feed import get_quote_stream
+from fetchers import (
+    FETCH_DEADLINE, FETCH_MAX_WORKERS, fetch_watchlist, get_fetch_pool, get_kline_history, get_realtime_price,
+    market_sources, project_m20,
+)
+from metrics import start_metrics_server
+from poller import MarketDataPoller
+from quotes import get_quote_chain
+from styles import STYLE_MAX_ROWS, style_report
+from sweep import DEFAULT_LOSS_CUTS, DEFAULT_PREMIUMS, DEFAULT_WINDOWS, PERIOD_LABELS, run_sweep
+from timing import LOG_PATH, recent_spans, span, span_summary
 
 # === 页面配置 ===
 st.set_page_config(
@@ -18,247 +27,190 @@ st.set_page_config(
 )
 
 # === 样式配置 ===
-COLOR_BUY_BG = "#6B8E23"    # 橄榄绿
-COLOR_BUY_TEXT = "#FFFFFF"  # 白
-COLOR_RT_BG = "#D6DCE5"     # 淡蓝灰
-
-# === 网络请求增强模块 (核心修复) ===
-def get_robust_session():
-    """创建一个带有自动重试功能的 Session"""
-    session = requests.Session()
-    # 设置重试策略：总共重试3次，退避系数1(即间隔1s, 2s, 4s再试)，针对常见的500/502/503错误和连接错误
-    retries = Retry(
-        total=3,
-        backoff_factor=1, 
-        status_forcelist=[500, 502, 503, 504],
-        allowed_methods=["GET"]
-    )
-    # 将重试策略挂载到 http 和 https
-    adapter = HTTPAdapter(max_retries=retries)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    
-    # 设置通用浏览器头
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "*/*",
-        "Connection": "keep-alive"
-    })
-    return session
-
-# 初始化全局 session
-http = get_robust_session()
-
-# === 数据获取函数 (带缓存 + 增强网络) ===
-
-@st.cache_data(ttl=60)
-def get_tiantian_valuation(code="159941"):
-    """获取天天基金实时估值"""
-    try:
-        timestamp = int(time.time() * 1000)
-        url = f"http://fundgz.1234567.com.cn/js/{code}.js?rt={timestamp}"
-        
-        # 使用增强 session，超时设置为 15秒
-        r = http.get(url, timeout=15)
-        
-        if r.status_code == 200:
-            match = re.search(r'jsonpgz\((.*?)\);', r.text)
-            if match:
-                data = json.loads(match.group(1))
-                val = data.get("gsz", data.get("dwjz", None))
-                if val: return float(val)
-        return 0.0
-    except Exception as e:
-        # 记录错误但不阻断，返回0让流程继续
-        print(f"Valuation Error: {e}")
-        return 0.0
-
-@st.cache_data(ttl=60)
-def get_realtime_data(code="159941"):
-    """获取实时价格与溢价率"""
-    price = 0.0
-    premium = 0.0
-    valuation = 0.0
-    
-    # 1. 获取估值 (优先获取，因为比较容易)
-    valuation = get_tiantian_valuation(code)
-    
-    # 2. 获取现价
-    try:
-        # 使用 e1 接口可能比 push2 更稳定一些，或者继续用 push2 但加长超时
-        url = "https://push2.eastmoney.com/api/qt/stock/get"
-        params = {
-            "invt": "2", 
-            "fltt": "2", 
-            "secid": f"0.{code}", 
-            "fields": "f43"
-        }
-        # 超时时间加长到 20秒
-        r = http.get(url, params=params, timeout=20)
-        data_json = r.json()
-        
-        if data_json.get("data"):
-            p_str = str(data_json["data"].get("f43", "-"))
-            price = float(p_str) if p_str != "-" else 0.0
-        else:
-            # 如果 push2 失败，尝试备用接口 (快照接口)
-            url_backup = f"http://quote.eastmoney.com/{code}.html" # 仅作示例，实际API切换逻辑较复，这里主要靠重试
-            pass
+# 自选列表默认代码 (同样适用溢价 + 周M20 规则的跨境/QDII ETF)
+DEFAULT_WATCHLIST = "159941, 513100, 159632, 513500"
 
-    except Exception as e:
-        st.toast(f"获取现价超时: {str(e)}", icon="⚠️")
+# 持有数量为 0 时回测每次买入的股数
+BACKTEST_DEFAULT_QTY = 100
+# 参数扫描结果展示的前多少名
+SWEEP_TOP = 50
 
-    # 3. 计算溢价
-    if price > 0 and valuation > 0:
-        premium = ((price - valuation) / valuation) * 100
-        
-    return price, premium, valuation
+# 报表列的展示格式：分析结果保持数值/布尔/分类类型，只在渲染时格式化
+REPORT_COLUMN_CONFIG = {
+    "type": None,
+    "溢价率": st.column_config.NumberColumn("溢价率", format="%.3f%%"),
+    "现价": st.column_config.NumberColumn("现价", format="%.3f"),
+    "估值": st.column_config.NumberColumn("估值", format="%.4f"),
+    "周M20": st.column_config.NumberColumn("周M20", format="%.3f"),
+    "在M20上": st.column_config.CheckboxColumn("在M20上"),
+    "M20向上": st.column_config.CheckboxColumn("M20向上"),
+    "收益": st.column_config.NumberColumn("收益", format="%.2f%%"),
+    "比对M20": st.column_config.NumberColumn("比对M20", format="%.2f%%"),
+    "判定": st.column_config.TextColumn("判定", help="是否符合全部买入条件", width="small"),
+    "理由": st.column_config.TextColumn("详细理由", width="medium"),
+}
 
-@st.cache_data(ttl=3600)
-def get_historical_nav_map(code="159941"):
-    try:
-        # Akshare 内部使用了 requests，我们尽量捕获它的超时
-        # 增加一个全局超时设置给 akshare (如果支持) 或者直接调用
-        df = ak.fund_open_fund_info_em(symbol=code, indicator="单位净值走势")
-        df['净值日期'] = df['净值日期'].astype(str)
-        nav_map = dict(zip(df['净值日期'], df['单位净值']))
-        return nav_map
-    except Exception:
-        return {}
-
-@st.cache_data(ttl=300)
-def get_kline_data(code="159941"):
-    try:
-        # K线数据量大，更容易超时，这里不做特殊处理，依赖 akshare 自身的重试
-        # 如果 akshare 经常报错，可能需要自己写 requests 请求 K线 API
-        hist_df = ak.fund_etf_hist_em(symbol=code, period="weekly", adjust="")
-        hist_df = hist_df.loc[:, ~hist_df.columns.duplicated()]
-        hist_df['M20'] = hist_df['收盘'].rolling(window=20).mean()
-        hist_df = hist_df.sort_values(by='日期', ascending=False).reset_index(drop=True)
-        return hist_df
-    except Exception as e:
-        print(f"K-Line Error: {e}")
-        return pd.DataFrame()
+def report_column_order(df):
+    """判定列放在理由之前"""
+    columns = [c for c in df.columns if c not in ("type", "is_buy", "判定", "理由")]
+    return columns + ["判定", "理由"]
+
+# 实时模式：顶部指标与实时行的刷新间隔 (秒)；期间后台报价的刷新间隔，
+# 以及会话停止续约后多久恢复按缓存 ttl 刷新
+LIVE_INTERVAL = 2
+LIVE_QUOTE_INTERVAL = 5
+LIVE_LEASE = 30
+# 启用报价推送流 (ETF_QUOTE_FEED) 时的页面更新间隔 (秒)
+STREAM_INTERVAL = 0.5
+
+# 调试面板展示最近多少条耗时记录
+DEBUG_SPAN_ROWS = 200
+
+# 数据源显示名称 (缓存过期提示用)
+STALE_LABELS = {"valuation": "估值", "price": "现价", "kline": "K线", "nav": "历史净值"}
 
 # === 主逻辑处理 ===
 
+@st.cache_resource
+def get_market_poller(code="159941"):
+    """每个服务进程只启动一个后台刷新线程，所有会话共享其快照"""
+    pool = get_fetch_pool(FETCH_MAX_WORKERS)
+    return MarketDataPoller(code, market_sources(), pool, FETCH_DEADLINE).start()
+
+@st.cache_resource
+def get_price_stream(code="159941"):
+    """已配置 ETF_QUOTE_FEED 时启动报价推送流 (每个服务进程一条连接)，推送的报价直接写入现价缓存"""
+    stream = get_quote_stream(code)
+    if stream is not None:
+        stream.bus.subscribe(lambda tick: get_realtime_price.put(tick.price, tick.code))
+    return stream
+
+@st.cache_resource
+def get_metrics_server():
+    """已设置 ETF_METRICS_PORT 时在后台线程提供 Prometheus /metrics (每个服务进程一个)；
+    经 serve.py 启动时接口已随进程开启，这里返回同一个 server"""
+    try:
+        return start_metrics_server()
+    except OSError as e:
+        print(f"Metrics Server Error: {e}")
+        return None
+
 def calculate_analysis(cost, qty):
-    # 并行或串行获取数据
-    # 为防止云端线程池限制，保持串行但有缓存
-    
-    # 提示用户进度
+    # 数据由后台线程定时刷新，这里只读内存快照；仅进程刚启动时需要等待首轮刷新
+    poller = get_market_poller()
     status_text = st.empty()
-    status_text.text("正在连接天天基金获取估值...")
-    current_price, current_premium, current_valuation = get_realtime_data()
-    
-    if current_price == 0:
-        status_text.error("无法连接到行情服务器，请刷新页面重试 (可能因网络波动)。")
-        return pd.DataFrame()
-        
-    status_text.text("正在获取历史K线数据...")
-    hist_df = get_kline_data()
-    
-    if hist_df.empty:
-        status_text.error("K线数据获取失败，请稍后重试。")
+    if not poller.wait_ready(0):
+        status_text.text("正在并发获取估值、现价、K线与历史净值...")
+        poller.wait_ready(FETCH_DEADLINE)
+    data = poller.snapshot()
+
+    error = check_market_data(data)
+    if error:
+        status_text.error(error)
         return pd.DataFrame()
         
-    status_text.text("正在匹配历史净值...")
-    nav_map = get_historical_nav_map()
-    
     status_text.empty() # 清除进度提示
+    # 实时行按“本周若以现价收盘”预估周M20，只读均线增量状态，不重新获取K线
+    with span("analysis build_report", rows=len(data["kline"])):
+        return build_report(data, cost, project_m20("159941", data["price"]))
 
-    rows = []
-    
-    # === 实时行 ===
-    latest_k_m20 = float(hist_df.iloc[0]['M20'])
-    prev_k_m20 = float(hist_df.iloc[1]['M20'])
-    
-    is_above_m20 = current_price > latest_k_m20
-    is_m20_up = latest_k_m20 > prev_k_m20
-    
-    profit_str = f"{(current_price - cost)/cost*100:.2f}%" if cost > 0 else "-"
-    m20_diff_str = f"{(latest_k_m20 - cost)/cost*100:.2f}%" if cost > 0 else "-"
-    
-    reasons = []
-    can_buy = True
-    if current_premium >= 1.0: can_buy=False; reasons.append(f"溢价高({current_premium:.2f}%)")
-    if not is_above_m20: can_buy=False; reasons.append("低于M20")
-    if not is_m20_up: can_buy=False; reasons.append("M20未向上")
-    if cost > 0 and ((current_price - cost)/cost*100) <= -8.0: can_buy=False; reasons.append("亏损超8%")
-
-    rows.append({
-        "type": "realtime",
-        "时间": f"{datetime.now().strftime('%m-%d %H:%M')} (实时)",
-        "溢价率": f"{current_premium:.3f}%",
-        "现价": current_price,
-        "周M20": f"{latest_k_m20:.3f}",
-        "在M20上": "是" if is_above_m20 else "否",
-        "M20向上": "是" if is_m20_up else "否",
-        "收益": profit_str,
-        "比对M20": m20_diff_str,
-        "判定": "符合条件" if can_buy else "不符合",
-        "理由": "" if can_buy else "，".join(reasons),
-        "is_buy": can_buy
-    })
-
-    # === 历史行 (50周) ===
-    for i in range(51):
-        if i >= len(hist_df) - 1: break
-        
-        row = hist_df.iloc[i]
-        prev_row = hist_df.iloc[i+1]
-        
-        raw_date = str(row['日期']).split()[0]
-        h_price = float(row['收盘'])
-        h_m20 = float(row['M20']) if pd.notna(row['M20']) else None
-        
-        h_premium_val = None
-        if raw_date in nav_map:
-            nav = float(nav_map[raw_date])
-            if nav > 0: h_premium_val = (h_price - nav) / nav * 100
-        elif i == 0 and current_valuation > 0:
-            h_premium_val = (h_price - current_valuation) / current_valuation * 100
-        
-        h_premium_str = f"{h_premium_val:.3f}%" if h_premium_val is not None else "--"
-        
-        h_m20_up = False
-        if h_m20 and pd.notna(prev_row['M20']):
-            h_m20_up = h_m20 > float(prev_row['M20'])
-        
-        h_above_m20 = h_price > h_m20 if h_m20 else False
-        
-        h_prof = f"{(h_price-cost)/cost*100:.2f}%" if cost > 0 else "-"
-        h_diff = f"{(h_m20-cost)/cost*100:.2f}%" if cost > 0 and h_m20 else "-"
-        
-        h_buy = True
-        h_rsn = []
-        if h_premium_val is not None and h_premium_val >= 1.0: h_buy=False; h_rsn.append("溢价高")
-        if not h_above_m20: h_buy=False; h_rsn.append("低于M20")
-        if not h_m20_up: h_buy=False; h_rsn.append("M20向下")
-        if cost > 0 and ((h_price-cost)/cost*100) <= -8.0: h_buy=False; h_rsn.append("亏损超8%")
-        
-        rows.append({
-            "type": "history",
-            "时间": raw_date,
-            "溢价率": h_premium_str,
-            "现价": h_price,
-            "周M20": f"{h_m20:.3f}" if h_m20 else "-",
-            "在M20上": "是" if h_above_m20 else "否",
-            "M20向上": "是" if h_m20_up else "否",
-            "收益": h_prof,
-            "比对M20": h_diff,
-            "判定": "符合" if h_buy else "不符合",
-            "理由": "" if h_buy else "，".join(h_rsn),
-            "is_buy": h_buy
-        })
-        
-    return pd.DataFrame(rows)
+def calculate_watchlist(codes):
+    status_text = st.empty()
+    status_text.text(f"正在并发获取 {len(codes)} 只基金的报价、估值与K线...")
+    results = fetch_watchlist(codes)
+    status_text.empty()
+    prices = results["prices"] or {}
+    live_m20 = {code: project_m20(code, prices.get(code, 0.0)) for code in codes}
+    with span("analysis build_watchlist_report", codes=len(codes)):
+        return build_watchlist_report(codes, results, live_m20)
 
 # === 界面渲染 ===
 
+def render_report(df, **kwargs):
+    """渲染分析/自选报表：判定列为原生分类标记，小表额外按行着色"""
+    with span("render report", rows=len(df), styled=len(df) <= STYLE_MAX_ROWS):
+        st.dataframe(
+            style_report(df),
+            use_container_width=True,
+            column_order=report_column_order(df),
+            column_config=REPORT_COLUMN_CONFIG,
+            **kwargs,
+        )
+
+def render_debug_panel():
+    """各阶段耗时汇总与最近的明细记录 (上游请求、缓存、解析、分析、渲染)"""
+    with st.expander("🐞 调试：分阶段耗时"):
+        summary = span_summary()
+        if summary.empty:
+            st.caption("暂无记录")
+            return
+        st.dataframe(summary, use_container_width=True, hide_index=True, column_config={
+            col: st.column_config.NumberColumn(col, format="%.1f") for col in ("平均(ms)", "P95(ms)", "最大(ms)")
+        })
+        recent = pd.DataFrame(recent_spans(DEBUG_SPAN_ROWS))
+        recent["ts"] = pd.to_datetime(recent["ts"], unit="s", utc=True).dt.tz_convert("Asia/Shanghai").dt.strftime("%H:%M:%S.%f").str[:-3]
+        recent["attrs"] = recent["attrs"].map(lambda attrs: ", ".join(f"{k}={v}" for k, v in attrs.items()))
+        st.dataframe(
+            recent.drop(columns=["id", "parent"]).rename(columns={
+                "ts": "时间", "name": "阶段", "duration_ms": "耗时(ms)", "outcome": "结果", "bytes": "字节",
+                "retries": "重试", "error": "错误", "thread": "线程", "attrs": "参数",
+            }),
+            use_container_width=True,
+            hide_index=True,
+        )
+        if LOG_PATH:
+            st.caption(f"完整记录 (JSON Lines)：{LOG_PATH}")
+
+def render_realtime_panel(realtime_df, live, stream=None):
+    """顶部四个指标与数据新鲜度提示；实时模式下另外展示实时判定行"""
+    realtime_row = realtime_df.iloc[0]
+    c1, c2, c3, c4 = st.columns(4)
+    with c1: st.metric("当前现价", f"¥{realtime_row['现价']:.3f}")
+    with c2: st.metric("实时溢价率", f"{realtime_row['溢价率']:.3f}%", delta="-高" if realtime_row['溢价率'] >= 1.0 else "正常", delta_color="inverse")
+    with c3: st.metric("周M20 (含现价预估)", f"{realtime_row['周M20']:.3f}",
+                       help="假设本周以当前现价收盘时的周M20，随每次报价更新")
+    with c4: 
+        is_ok = realtime_row['is_buy']
+        st.metric("综合判定", "可买入" if is_ok else "观望", delta="✅" if is_ok else "⛔", delta_color="normal")
+
+    entries = get_market_poller().entries()
+    stale = {name: entry.age for name, entry in entries.items() if entry is not None and entry.stale}
+    if stale:
+        st.warning("⚠️ 以下数据已过期，当前展示缓存旧值，后台正在刷新：" + "，".join(
+            f"{STALE_LABELS[name]} ({age:.0f} 秒前)" for name, age in stale.items()))
+    elif live and stream is not None and stream.connected:
+        tick = stream.latest()
+        st.caption(f"⚡ 实时模式 ({stream.feed.name}推送)：最新报价 {time.time() - tick.ts:.1f} 秒前，页面每 {STREAM_INTERVAL} 秒更新")
+    elif live:
+        st.caption(f"⚡ 实时模式：报价更新于 {entries['price'].age:.0f} 秒前 (后台每 {LIVE_QUOTE_INTERVAL} 秒刷新，页面每 {LIVE_INTERVAL} 秒更新)")
+    else:
+        st.caption(f"行情快照更新于 {entries['price'].age:.0f} 秒前 (后台每 {get_realtime_price.ttl} 秒刷新)")
+
+    if live:
+        render_report(realtime_df, hide_index=True)
+
+def live_realtime_panel(cost):
+    """实时模式的片段：只重跑本函数，读取内存中的最新报价并重算实时行，不触碰历史报表"""
+    poller = get_market_poller()
+    stream = get_price_stream()
+    if stream is None or not stream.connected:
+        # 没有推送流时缩短后台轮询间隔
+        poller.keep_fresh(["price"], LIVE_QUOTE_INTERVAL, LIVE_LEASE)
+    data = poller.snapshot()
+    error = check_market_data(data)
+    if error:
+        st.error(error)
+        return
+    with span("render live panel"):
+        render_realtime_panel(build_realtime_report(data, cost, project_m20("159941", data["price"])), live=True, stream=stream)
+
 st.title("📊 纳指ETF(159941) 决策系统")
 st.markdown("---")
 
+# 页面首次加载即启动后台刷新，用户点击按钮时数据通常已就绪
+get_metrics_server()
+get_market_poller()
+
 with st.sidebar:
     st.header("⚙️ 参数设置")
     cost_input = st.number_input("买入成本 (元)", min_value=0.0, value=0.0, step=0.001, format="%.3f")
@@ -268,59 +220,83 @@ with st.sidebar:
     st.markdown("- 溢价率 < 1%")
     st.markdown("- 现价 > 周M20")
     st.markdown("- 周M20 趋势向上")
+
+    live_mode = st.toggle("⚡ 实时模式", value=False, help=f"顶部指标与实时行每 {LIVE_INTERVAL} 秒自动更新，无需点击同步")
+
+    st.markdown("### 📑 自选列表")
+    watchlist_mode = st.toggle("自选列表模式", value=False)
+    watchlist_input = st.text_area("基金代码 (逗号、空格或换行分隔)", value=DEFAULT_WATCHLIST, disabled=not watchlist_mode)
     
     # 使用回调函数处理按钮点击，避免页面重载逻辑错误
     if st.button("🔄 同步并分析数据", type="primary", use_container_width=True):
         st.session_state['refresh'] = True
 
+# 上游熔断时立即提示，不必等请求超时
 if st.session_state.get('refresh', False):
+    degraded = [name for name, state in breaker_states().items() if state != CLOSED]
+    if degraded:
+        st.warning(f"⚠️ 上游服务降级：{'、'.join(degraded)} 熔断中，请求已快速失败，暂时展示缓存数据。")
+
+if st.session_state.get('refresh', False) and watchlist_mode:
+    codes = parse_watchlist(watchlist_input)
+    if codes:
+        summary_df = calculate_watchlist(codes)
+        st.markdown(f"### 📑 自选列表判定汇总 ({len(codes)} 只)")
+        render_report(summary_df, hide_index=True)
+    else:
+        st.warning("请输入至少一个 6 位基金代码。")
+elif st.session_state.get('refresh', False):
     df = calculate_analysis(cost_input, qty_input)
     
     if not df.empty:
-        realtime_row = df.iloc[0]
-        c1, c2, c3, c4 = st.columns(4)
-        with c1: st.metric("当前现价", f"¥{realtime_row['现价']}")
-        with c2: st.metric("实时溢价率", realtime_row['溢价率'], delta="-高" if "高" in realtime_row['理由'] else "正常", delta_color="inverse")
-        with c3: st.metric("周M20", realtime_row['周M20'])
-        with c4: 
-            is_ok = realtime_row['is_buy']
-            st.metric("综合判定", "可买入" if is_ok else "观望", delta="✅" if is_ok else "⛔", delta_color="normal")
-
-        def highlight_rows(row):
-            styles = [''] * len(row)
-            bg_color = ""
-            font_color = ""
-            font_weight = ""
-            if row['is_buy']:
-                bg_color = COLOR_BUY_BG
-                font_color = COLOR_BUY_TEXT
-                font_weight = "bold"
-            elif row['type'] == 'realtime':
-                bg_color = COLOR_RT_BG
-                font_weight = "bold"
-            
-            for i in range(len(row)):
-                css = ""
-                if bg_color: css += f"background-color: {bg_color}; "
-                if font_color: css += f"color: {font_color}; "
-                if font_weight: css += f"font-weight: {font_weight}; "
-                styles[i] = css
-            return styles
-
-        display_df = df.drop(columns=['type', 'is_buy'])
-        styled_df = df.style.apply(highlight_rows, axis=1).format({"现价": "{:.3f}"})
-
-        st.markdown("### 📋 详细分析报表 (过去50周)")
-        st.dataframe(
-            styled_df, 
-            use_container_width=True, 
-            height=800,
-            column_config={
-                "type": None, 
-                "is_buy": None,
-                "理由": st.column_config.TextColumn("详细理由", width="medium"),
-                "判定": st.column_config.TextColumn("判定", width="small"),
-            }
-        )
+        if live_mode:
+            # 定时只重跑片段 (指标 + 实时行)，下方历史报表保持不变
+            interval = STREAM_INTERVAL if get_price_stream() is not None else LIVE_INTERVAL
+            st.fragment(run_every=interval)(live_realtime_panel)(cost_input)
+        else:
+            render_realtime_panel(df.iloc[:1], live=False)
+
+        with st.expander("📡 行情源状态"):
+            st.dataframe(pd.DataFrame(get_quote_chain().stats()), use_container_width=True, hide_index=True)
+
+        st.markdown("### 📋 详细分析报表 (上市以来全部周线)")
+        # 实时模式下实时行已在上方片段中单独刷新
+        render_report(df.iloc[1:] if live_mode else df, height=800)
+
+        data = get_market_poller().snapshot()
+        bt_qty = qty_input or BACKTEST_DEFAULT_QTY
+        with st.expander("📈 规则回测 (上市以来全部周线)"):
+            st.caption(f"空仓且满足全部条件时按周收盘价买入 {bt_qty} 股，跌破周M20 或亏损超8% 时卖出"
+                       + (f"；期初按成本 {cost_input:.3f} 持有" if cost_input > 0 else ""))
+            # 折叠的 expander 内容每次重跑都会执行，回测与图表只在打开开关时计算
+            if st.toggle("运行回测", key="show_backtest"):
+                stats, curve, trades = backtest(data["kline"], data["nav"], qty=bt_qty, cost=cost_input)
+                b1, b2, b3, b4 = st.columns(4)
+                with b1: st.metric("交易次数", stats["交易次数"])
+                with b2: st.metric("胜率", f"{stats['胜率%']:.1f}%" if stats["交易次数"] else "-")
+                with b3: st.metric("总盈亏", f"¥{stats['总盈亏(元)']:.2f}", delta=f"{stats['累计收益率%']:.2f}%")
+                with b4: st.metric("最大回撤", f"¥{stats['最大回撤(元)']:.2f}")
+                st.line_chart(curve.set_index("日期")[["盈亏", "回撤"]])
+                st.dataframe(trades, use_container_width=True, hide_index=True)
+
+        with st.expander("🔬 参数扫描 (阈值网格搜索)"):
+            s1, s2 = st.columns(2)
+            with s1:
+                sweep_premiums = st.multiselect("溢价阈值 (%)", DEFAULT_PREMIUMS, default=DEFAULT_PREMIUMS)
+                sweep_windows = st.multiselect("均线窗口", DEFAULT_WINDOWS, default=DEFAULT_WINDOWS)
+            with s2:
+                sweep_loss_cuts = st.multiselect("止损线 (%)", DEFAULT_LOSS_CUTS, default=DEFAULT_LOSS_CUTS)
+                sweep_periods = st.multiselect("K线周期", list(PERIOD_LABELS), default=["weekly"], format_func=PERIOD_LABELS.get)
+            if st.button("开始扫描", disabled=not (sweep_premiums and sweep_windows and sweep_loss_cuts and sweep_periods)):
+                with st.spinner("正在多进程并行回测参数网格..."):
+                    histories = {
+                        period: prepare_history(get_kline_history("159941", period), data["nav"])
+                        for period in sweep_periods
+                    }
+                    sweep_df = run_sweep(histories, sweep_premiums, sweep_windows, sweep_loss_cuts, qty=bt_qty, top=SWEEP_TOP)
+                st.caption(f"按累计收益率排名前 {SWEEP_TOP} 组参数")
+                st.dataframe(sweep_df, use_container_width=True, hide_index=True)
 else:
     st.info("👈 请在左侧侧边栏点击“同步并分析数据”按钮。")
+
+render_debug_panel()
@@ -0,0 +1,167 @@
+"""买入规则回测引擎 (溢价 < 阈值、收盘 > MA、MA 向上、亏损未超止损线)
+
+在全部历史 K 线 + 净值上按时间顺序重放规则：空仓且规则满足时按收盘价买入 qty 股，
+持仓期间收盘跌破 MA 或亏损达到止损线时全部卖出。
+多组参数以 NumPy 数组同时计算 (每个时间步对所有参数组合做一次向量运算)，
+一次调用即可评估成千上万组参数，供参数扫描使用。
+"""
+import numpy as np
+import pandas as pd
+
+
+def prepare_history(hist_df, nav_map):
+    """把K线 (任意排序) 与净值映射整理为按日期升序的 NumPy 数组"""
+    df = hist_df.sort_values("日期").reset_index(drop=True)
+    dates = df["日期"].astype(str).str.split().str[0]
+    close = pd.to_numeric(df["收盘"], errors="coerce").to_numpy(dtype=np.float64)
+    nav = pd.to_numeric(dates.map(nav_map), errors="coerce").to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        premium = np.where(nav > 0, (close - nav) / nav * 100, np.nan)
+    return {"dates": dates.to_numpy(), "close": close, "premium": premium}
+
+
+def moving_averages(close, windows):
+    """用前缀和一次性计算多个窗口的简单移动平均，返回形状 (len(windows), T) 的矩阵"""
+    windows = np.asarray(windows, dtype=np.int64)
+    csum = np.concatenate(([0.0], np.cumsum(close)))
+    T = len(close)
+    ma = np.full((len(windows), T), np.nan)
+    for i, w in enumerate(windows):
+        if w <= T:
+            ma[i, w - 1:] = (csum[w:] - csum[:-w]) / w
+    return ma
+
+
+def run_backtest(close, premium, premium_threshold, ma_window, loss_cut, qty=100, cost=0.0, record=False):
+    """对多组参数同时回测
+
+    premium_threshold / ma_window / loss_cut 为等长数组 (每个元素一组参数)，
+    cost > 0 时视为期初已按该成本持有 qty 股。
+    返回每组参数的统计 (交易次数、胜率、累计收益等)；record=True 时额外返回
+    每个时间步的持仓与盈亏矩阵 (形状 (组合数, T)) 以及逐笔交易列表。
+    """
+    premium_threshold = np.atleast_1d(np.asarray(premium_threshold, dtype=np.float64))
+    loss_cut = np.atleast_1d(np.asarray(loss_cut, dtype=np.float64))
+    ma_window = np.atleast_1d(np.asarray(ma_window, dtype=np.int64))
+    K = len(premium_threshold)
+    T = len(close)
+
+    windows, window_index = np.unique(ma_window, return_inverse=True)
+    ma_by_window = moving_averages(close, windows)
+
+    # 溢价缺失 (当日无净值) 视为不高，与实时判定一致
+    premium_ok = ~(premium[None, :] >= premium_threshold[:, None])
+
+    shares = np.zeros(K)
+    avg_cost = np.zeros(K)
+    if cost > 0:
+        shares[:] = qty
+        avg_cost[:] = cost
+    realized = np.zeros(K)
+    trades = np.zeros(K, dtype=np.int64)
+    wins = np.zeros(K, dtype=np.int64)
+    log_growth = np.zeros(K)
+    holding_steps = np.zeros(K, dtype=np.int64)
+    equity = np.zeros(K)
+    peak = np.zeros(K)
+    max_drawdown = np.zeros(K)
+
+    if record:
+        position_hist = np.zeros((K, T))
+        equity_hist = np.zeros((K, T))
+        # 期初持仓的买入位置记为 -1
+        entry_index = np.full(K, -1)
+        trade_log = []
+
+    prev_ma = np.full(K, np.nan)
+    for t in range(T):
+        price = close[t]
+        ma = ma_by_window[window_index, t]
+        holding = shares > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pnl_pct = np.where(holding, (price - avg_cost) / avg_cost * 100, 0.0)
+        loss_hit = holding & (pnl_pct <= loss_cut)
+
+        # 卖出：跌破 MA 或触发止损
+        sell = holding & ((price < ma) | loss_hit)
+        if sell.any():
+            if record:
+                for k in np.flatnonzero(sell):
+                    trade_log.append((k, entry_index[k], t, avg_cost[k], price))
+            realized += np.where(sell, shares * (price - avg_cost), 0.0)
+            trades += sell
+            wins += sell & (price > avg_cost)
+            log_growth += np.where(sell, np.log(price / np.where(sell, avg_cost, 1.0)), 0.0)
+            shares = np.where(sell, 0.0, shares)
+            avg_cost = np.where(sell, 0.0, avg_cost)
+
+        # 买入：空仓且规则全部满足 (同一期刚卖出的不立即买回)
+        buy = (shares == 0) & ~sell & premium_ok[:, t] & (price > ma) & (ma > prev_ma)
+        if buy.any():
+            if record:
+                entry_index = np.where(buy, t, entry_index)
+            shares = np.where(buy, float(qty), shares)
+            avg_cost = np.where(buy, price, avg_cost)
+
+        holding_steps += shares > 0
+        equity = realized + shares * (price - avg_cost)
+        peak = np.maximum(peak, equity)
+        max_drawdown = np.maximum(max_drawdown, peak - equity)
+        prev_ma = ma
+
+        if record:
+            position_hist[:, t] = shares
+            equity_hist[:, t] = equity
+
+    result = {
+        "trades": trades,
+        "hit_rate": np.divide(wins, trades, out=np.full(K, np.nan), where=trades > 0),
+        "total_return_pct": (np.exp(log_growth) - 1) * 100,
+        "pnl": equity,
+        "max_drawdown": max_drawdown,
+        "exposure": holding_steps / T if T else np.zeros(K),
+        "open_position": shares > 0,
+    }
+    if record:
+        result["position"] = position_hist
+        result["equity"] = equity_hist
+        result["trade_log"] = trade_log
+    return result
+
+
+def backtest(hist_df, nav_map, premium_threshold=1.0, ma_window=20, loss_cut=-8.0, qty=100, cost=0.0):
+    """单组参数回测，返回 (统计字典, 逐期权益曲线 DataFrame, 交易明细 DataFrame)"""
+    data = prepare_history(hist_df, nav_map)
+    r = run_backtest(
+        data["close"], data["premium"], [premium_threshold], [ma_window], [loss_cut],
+        qty=qty, cost=cost, record=True,
+    )
+    position = r["position"][0]
+    equity = r["equity"][0]
+    curve = pd.DataFrame({
+        "日期": data["dates"],
+        "收盘": data["close"],
+        "持仓": position,
+        "盈亏": equity,
+        "回撤": equity - np.maximum(np.maximum.accumulate(equity), 0.0),
+    })
+
+    log = r["trade_log"]
+    trades = pd.DataFrame({
+        "买入日期": [data["dates"][i] if i >= 0 else "期初持仓" for _, i, _, _, _ in log],
+        "买入价": [entry for _, _, _, entry, _ in log],
+        "卖出日期": [data["dates"][t] for _, _, t, _, _ in log],
+        "卖出价": [exit_price for _, _, _, _, exit_price in log],
+    })
+    trades["收益率%"] = (trades["卖出价"] - trades["买入价"]) / trades["买入价"] * 100
+
+    stats = {
+        "交易次数": int(r["trades"][0]),
+        "胜率%": float(r["hit_rate"][0] * 100) if r["trades"][0] else float("nan"),
+        "累计收益率%": float(r["total_return_pct"][0]),
+        "总盈亏(元)": float(r["pnl"][0]),
+        "最大回撤(元)": float(r["max_drawdown"][0]),
+        "持仓时间占比%": float(r["exposure"][0] * 100),
+        "当前持仓": bool(r["open_position"][0]),
+    }
+    return stats, curve, trades
@@ -0,0 +1,236 @@
+"""数据管线基准：抓取 + 解析 + 分析 + 渲染，按历史长度 (50 周 ~ 20 年) 逐项计时，结果存档并与上次对比
+
+上游响应来自仓库中的录制数据 (fixtures.py)，由模拟行情服务器 (mock_upstream.py) 回放，
+akshare 兜底路径回放录制的 DataFrame，全程不访问网络。各用例内的解析耗时取自 timing.py 的 span。
+
+与 benchmarks/results 下最近一次本地结果对比。没有本地结果时展示与提交的参考结果
+(pipeline-reference.json，作者机器上测得) 的差异，仅供参考；--check 只认本地结果，
+没有时报错退出，需先不带 --check 运行一次生成本地基准。基于不同数据 (fixture_digest 不同) 的结果不做对比。
+
+    python benchmarks/bench_pipeline.py                      # 默认 50 / 260 / 520 / 1040 周
+    python benchmarks/bench_pipeline.py --weeks 50 1040 --repeat 3 --threshold 0.2 --check
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from contextlib import closing, redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+REFERENCE_PATH = os.path.join(BENCH_DIR, "pipeline-reference.json")
+
+# 本地仓库与 span 日志写到临时目录，不影响 .data 下的真实数据
+os.environ.setdefault("ETF_DATA_DIR", tempfile.mkdtemp(prefix="etf-bench-"))
+sys.path.insert(0, ROOT)
+
+import fetchers  # noqa: E402
+import store  # noqa: E402
+from analysis import build_report  # noqa: E402
+from bench_render import CASES as RENDER_CASES, marshall  # noqa: E402
+from fixtures import DEFAULT_CODE, ensure_fixtures, fixture_digest, fixture_source, read_akshare, recorded_data  # noqa: E402
+from mock_upstream import start_mock_upstream  # noqa: E402
+from net import set_upstream_base  # noqa: E402
+from timing import SPAN_BUFFER, recent_spans  # noqa: E402
+
+DEFAULT_WEEKS = [50, 260, 520, 1040]
+
+
+def reset_store(code):
+    """清空该代码的本地仓库与均线状态，下一次抓取即为冷启动"""
+    with closing(store._connect()) as conn, conn:
+        conn.execute("DELETE FROM kline WHERE code = ?", (code,))
+        conn.execute("DELETE FROM nav WHERE code = ?", (code,))
+    fetchers._ma_series.pop(code, None)
+
+
+def akshare_replay(code):
+    """替代 akshare 模块，回放录制的 DataFrame (按模拟服务器当前的历史长度截取)"""
+    hist = read_akshare("hist", code)
+    nav = read_akshare("nav", code)
+
+    def fund_etf_hist_em(symbol, period, start_date, end_date, adjust):
+        start = f"{start_date[:4]}-{start_date[4:6]}-{start_date[6:8]}"
+        return hist[hist["日期"] >= max(start, akshare.first_date)].reset_index(drop=True)
+
+    def fund_open_fund_info_em(symbol, indicator):
+        return nav[nav["净值日期"] >= akshare.first_date].reset_index(drop=True)
+
+    akshare = types.SimpleNamespace(
+        fund_etf_hist_em=fund_etf_hist_em, fund_open_fund_info_em=fund_open_fund_info_em, first_date="")
+    return akshare
+
+
+def measure(func, repeat, setup=None):
+    """返回 (各次耗时 ms, 各次解析阶段耗时 {span 名称: [ms]})"""
+    timings, stages = [], {}
+    for _ in range(repeat):
+        if setup:
+            setup()
+        mark = recent_spans(1)[0]["id"] if recent_spans(1) else 0
+        # akshare 兜底用例中直连接口的失败日志是预期的，不输出
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        totals = {}
+        for s in recent_spans(SPAN_BUFFER):
+            if s["id"] <= mark:
+                break
+            if s["name"].startswith("parse "):
+                totals[s["name"]] = totals.get(s["name"], 0.0) + s["duration_ms"]
+        for name, ms in totals.items():
+            stages.setdefault(name, []).append(ms)
+    return timings, stages
+
+
+def run_cases(mock, akshare, weeks, repeat, code=DEFAULT_CODE):
+    """对一个历史长度执行全部用例，返回 [(用例, 解析阶段, 耗时列表)]，用例本身的阶段为空字符串"""
+    recorded = mock.data(code)
+    recorded.set_weeks(weeks)
+    akshare.first_date = recorded.weekly[0][:10]
+    results = []
+
+    def add(name, func, setup=None):
+        timings, stages = measure(func, repeat, setup)
+        results.append((name, "", timings))
+        for stage, ms in stages.items():
+            results.append((name, stage, ms))
+
+    def cold():
+        reset_store(code)
+
+    def direct():
+        mock.failing.clear()
+
+    def fallback():
+        reset_store(code)
+        mock.failing.update({"push2his.eastmoney.com", "fund.eastmoney.com"})
+
+    add("get_kline_data 冷启动 (push2his)", lambda: fetchers.get_kline_data.refresh(code), lambda: (direct(), cold()))
+    add("get_kline_data 增量同步", lambda: fetchers.get_kline_data.refresh(code))
+    add("get_historical_nav_map 冷启动 (pingzhongdata)", lambda: fetchers.get_historical_nav_map.refresh(code), cold)
+    add("get_historical_nav_map 增量同步 (lsjz)", lambda: fetchers.get_historical_nav_map.refresh(code))
+    add("get_kline_data 冷启动 (akshare 回放)", lambda: fetchers.get_kline_data.refresh(code), fallback)
+    add("get_historical_nav_map 冷启动 (akshare 回放)", lambda: fetchers.get_historical_nav_map.refresh(code), fallback)
+    direct()
+    add("估值 fundgz 请求 + 解析", lambda: fetchers.parse_valuation(fetchers.http.get(fetchers.valuation_url(code))))
+
+    data = {
+        "price": recorded.price,
+        "valuation": fetchers.parse_valuation(fetchers.http.get(fetchers.valuation_url(code))),
+        "kline": fetchers.get_kline_data.refresh(code).value,
+        "nav": fetchers.get_historical_nav_map.refresh(code).value,
+    }
+    add("分析 build_report", lambda: build_report(data, cost=0.0))
+    report = build_report(data, cost=0.0)
+    for name, build in RENDER_CASES.items():
+        add(f"渲染 {name}", lambda build=build: marshall(build(report)))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def latest_result():
+    """最近一次本地结果，没有时为提交的参考结果"""
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, "pipeline-*.json")))
+    path = paths[-1] if paths else REFERENCE_PATH
+    if not os.path.exists(path):
+        return None, None
+    with open(path, encoding="utf-8") as f:
+        return path, json.load(f)
+
+
+def save_result(rows, digest, source):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, time.strftime("pipeline-%Y%m%d-%H%M%S.json"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fixtures": digest,
+            "fixture_source": source,
+            "rows": rows,
+        }, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数据管线耗时基准 (离线回放)")
+    parser.add_argument("--weeks", type=int, nargs="+", default=DEFAULT_WEEKS, help="历史长度 (周)")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数 (默认 5)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="中位数比上次慢多少视为退化 (默认 0.2 即 20%%)")
+    parser.add_argument("--check", action="store_true", help="存在退化时以非零状态退出")
+    parser.add_argument("--no-save", action="store_true", help="不保存本次结果")
+    args = parser.parse_args(argv)
+
+    ensure_fixtures(DEFAULT_CODE)
+    digest = fixture_digest(DEFAULT_CODE)
+    source = (fixture_source(DEFAULT_CODE) or {}).get("source", "unknown")
+    print(f"回放数据: {DEFAULT_CODE} {source} ({digest})"
+          + ("" if source == "recorded" else "，非真实录制，可运行 python benchmarks/fixtures.py record 替换"))
+    server = start_mock_upstream(source=recorded_data)
+    set_upstream_base(f"http://127.0.0.1:{server.server_address[1]}")
+    akshare = akshare_replay(DEFAULT_CODE)
+    fetchers._akshare = lambda: akshare
+
+    prev_path, prev = latest_result()
+    reference = prev_path == REFERENCE_PATH
+    if prev and prev.get("fixtures") != digest:
+        print(f"{os.path.relpath(prev_path, ROOT)} 基于另一份数据 ({prev.get('fixtures') or '未记录'}，当前 {digest})，不做对比")
+        prev = None
+    if args.check and (prev is None or reference):
+        sys.exit("--check: 没有本机基于当前数据的基准结果，请先不带 --check 运行一次 (结果存入 benchmarks/results)")
+    baseline = {(row["case"], row["stage"], row["weeks"]): row["median_ms"] for row in prev["rows"]} if prev else {}
+    if prev:
+        print(f"对比{'参考' if reference else '上次'}结果: {os.path.relpath(prev_path, ROOT)} (revision {prev.get('revision') or '-'})"
+              + ("，参考结果在另一台机器上测得，差异仅供参考" if reference else ""))
+
+    rows, regressions = [], []
+    print(f"{'周数':>6}  {'用例':<44}{'中位数(ms)':>12}{'最小(ms)':>12}{'上次(ms)':>12}{'变化':>9}")
+    for weeks in args.weeks:
+        for name, stage, timings in run_cases(server.mock, akshare, weeks, args.repeat):
+            median = statistics.median(timings)
+            rows.append({"case": name, "stage": stage, "weeks": weeks, "median_ms": round(median, 3), "min_ms": round(min(timings), 3)})
+            before = baseline.get((name, stage, weeks))
+            change = ""
+            if before:
+                ratio = median / before - 1
+                change = f"{ratio:+.0%}"
+                # 亚毫秒级的用例抖动大，不计入退化
+                if ratio > args.threshold and median - before > 1:
+                    change += " ⚠"
+                    regressions.append((f"{name} / {stage}" if stage else name, weeks, before, median))
+            label = f"  └ {stage}" if stage else name
+            print(f"{weeks:>6}  {label:<44}{median:>12.2f}{min(timings):>12.2f}{before or float('nan'):>12.2f}{change:>9}")
+    server.shutdown()
+    server.server_close()
+
+    if not args.no_save:
+        print(f"结果已保存: {os.path.relpath(save_result(rows, digest, source), ROOT)}")
+    if regressions:
+        print(f"\n{len(regressions)} 项比{'参考结果 (仅供参考)' if reference else '上次'}慢 {args.threshold:.0%} 以上:")
+        for name, weeks, before, median in regressions:
+            print(f"  {weeks:>5} 周  {name}: {before:.2f} -> {median:.2f} ms")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""报表渲染基准：对比 Styler 逐行着色 (旧实现)、Styler 整表着色 (styles.row_styles)
+与页面实际交给 st.dataframe 的数据 (styles.style_report，超过 STYLE_MAX_ROWS 行不着色) 的序列化耗时
+
+用合成的周线与净值数据生成报表 (不访问网络)，计时的是生成样式以及 st.dataframe 内部
+把数据与样式编码为 Arrow 消息的部分，即随行数增长的渲染开销。
+
+    python benchmarks/bench_render.py --weeks 400 2000 6000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from streamlit import dataframe_util
+from streamlit.elements.lib.pandas_styler_utils import marshall_styler
+from streamlit.proto.ArrowData_pb2 import ArrowData
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import build_report  # noqa: E402
+from styles import CSS_BUY, CSS_RT, row_styles, style_report  # noqa: E402
+
+
+def make_market_data(weeks, seed=0):
+    """合成按日期降序的周线 (含 M20) 与逐日净值"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end="2025-08-29", periods=weeks, freq="W-FRI")
+    close = 1.0 + np.cumsum(rng.normal(0.002, 0.03, weeks)).clip(-0.9)
+    kline = pd.DataFrame({"日期": dates.strftime("%Y-%m-%d"), "收盘": close.round(3)})
+    kline["M20"] = kline["收盘"].rolling(20, min_periods=1).mean()
+    nav = dict(zip(kline["日期"], (close / (1 + rng.normal(0.003, 0.006, weeks))).round(4)))
+    return {"price": float(close[-1]), "valuation": float(close[-1]), "kline": kline.iloc[::-1].reset_index(drop=True), "nav": nav}
+
+
+def rowwise(row):
+    """旧实现：每行一次 Python 回调，逐单元格拼接 CSS"""
+    css = CSS_BUY if row["is_buy"] else CSS_RT if row["type"] == "realtime" else ""
+    return [css] * len(row)
+
+
+def marshall(data):
+    proto = ArrowData()
+    if isinstance(data, pd.DataFrame):
+        proto.data = dataframe_util.convert_anything_to_arrow_bytes(data)
+    else:
+        marshall_styler(proto, data, "bench")
+        proto.data = dataframe_util.convert_anything_to_arrow_bytes(data.data)
+    return proto
+
+
+CASES = {
+    "Styler 逐行 apply(axis=1)": lambda df: df.style.apply(rowwise, axis=1),
+    "Styler 整表 row_styles": lambda df: df.style.apply(row_styles, axis=None),
+    "style_report (页面实际输出)": style_report,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="报表渲染耗时基准")
+    parser.add_argument("--weeks", type=int, nargs="+", default=[400, 2000, 6000], help="报表行数 (周数)")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数 (默认 5)")
+    args = parser.parse_args(argv)
+
+    print(f"{'行数':>6}  {'方式':<34}{'中位数(ms)':>12}{'最小(ms)':>12}{'消息(KB)':>12}")
+    for weeks in args.weeks:
+        report = build_report(make_market_data(weeks), cost=0.0)
+        for name, build in CASES.items():
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                proto = marshall(build(report))
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{len(report):>6}  {name:<34}{statistics.median(timings):>12.1f}{min(timings):>12.1f}{proto.ByteSize() / 1024:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
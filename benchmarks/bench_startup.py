@@ -0,0 +1,47 @@
+"""冷启动基准：在全新子进程中测量导入与首次渲染耗时，对比 akshare 按需加载的效果
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "import akshare (旧版启动必经)": "import akshare",
+    "import fetchers, analysis": "import fetchers, analysis",
+    "import fetchers + akshare": "import fetchers, analysis, akshare",
+    "app.py 首屏渲染 (AppTest)": (
+        "from streamlit.testing.v1 import AppTest; "
+        "AppTest.from_file('app.py', default_timeout=60).run()"
+    ),
+}
+
+
+def measure(stmt, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # os._exit 跳过解释器退出时等待后台抓取线程，只计启动与渲染本身
+        subprocess.run([sys.executable, "-c", stmt + "; import os; os._exit(0)"], cwd=ROOT, check=True, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="冷启动耗时基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数 (默认 5)")
+    args = parser.parse_args(argv)
+
+    print(f"{'场景':<32}{'中位数(ms)':>12}{'最小(ms)':>12}")
+    for name, stmt in CASES.items():
+        timings = measure(stmt, args.repeat)
+        print(f"{name:<32}{statistics.median(timings):>12.0f}{min(timings):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
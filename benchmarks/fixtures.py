@@ -0,0 +1,197 @@
+"""基准测试用的上游数据快照 (fixtures)
+
+保存各上游接口的原始响应 (gzip 压缩)，基准测试由模拟行情服务器 (mock_upstream.py) 回放，不访问网络：
+    fundgz_<代码>.js.gz              天天基金估值 jsonpgz(...)
+    push2_<代码>.json.gz             东财 push2 现价 (f43)
+    push2his_<代码>.json.gz          东财 push2his 周线 (全部历史)
+    pingzhongdata_<代码>.js.gz       天天基金 pingzhongdata 单位净值走势
+    akshare_hist_<代码>.csv.gz       akshare fund_etf_hist_em 周线
+    akshare_nav_<代码>.csv.gz        akshare fund_open_fund_info_em 单位净值走势
+
+manifest.json 记录每个代码的数据来源 (recorded 联网录制 / synthetic 合成)，基准输出与结果中会注明；
+基准结果只在同一份数据间可比，更换数据后 fixture_digest 随之改变。
+
+    python benchmarks/fixtures.py record        # 联网录制真实响应
+    python benchmarks/fixtures.py synthesize    # 离线生成同格式的确定性数据 (默认 20 年)
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fetchers import KLINE_COLUMNS, KLINE_PERIODS  # noqa: E402
+from mock_upstream import RecordedData  # noqa: E402
+from net import BROWSER_HEADERS  # noqa: E402
+from quotes import get_secid  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_CODE = "159941"
+SYNTHETIC_WEEKS = 20 * 52
+SYNTHETIC_END = "2025-08-29"
+MANIFEST_PATH = os.path.join(FIXTURE_DIR, "manifest.json")
+KINDS = ("fundgz", "push2", "push2his", "pingzhongdata", "akshare_hist", "akshare_nav")
+
+
+def fixture_path(kind, code=DEFAULT_CODE):
+    ext = {"fundgz": "js", "pingzhongdata": "js", "akshare_hist": "csv", "akshare_nav": "csv"}.get(kind, "json")
+    return os.path.join(FIXTURE_DIR, f"{kind}_{code}.{ext}.gz")
+
+
+def read_fixture(kind, code=DEFAULT_CODE):
+    with gzip.open(fixture_path(kind, code), "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def recorded_data(code=DEFAULT_CODE):
+    """供 mock_upstream 回放的数据源"""
+    return RecordedData(code, read_fixture("fundgz", code), read_fixture("push2", code), read_fixture("push2his", code), read_fixture("pingzhongdata", code))
+
+
+def read_akshare(kind, code=DEFAULT_CODE):
+    """回放录制的 akshare DataFrame (列名与 akshare 返回一致)"""
+    return pd.read_csv(fixture_path(f"akshare_{kind}", code), dtype={"日期": str, "净值日期": str})
+
+
+def _write(kind, code, text):
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    # mtime=0 使同样的数据生成同样的文件
+    with open(fixture_path(kind, code), "wb") as f:
+        f.write(gzip.compress(text.encode("utf-8"), mtime=0))
+
+
+def fixture_source(code=DEFAULT_CODE):
+    """数据来源 {"source": "recorded" | "synthetic", ...}，没有记录时为 None"""
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    with open(MANIFEST_PATH, encoding="utf-8") as f:
+        return json.load(f).get(code)
+
+
+def _set_source(code, **info):
+    manifest = {}
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            manifest = json.load(f)
+    manifest[code] = info
+    with open(MANIFEST_PATH, "w", encoding="utf-8", newline="\n") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def fixture_digest(code=DEFAULT_CODE):
+    """该代码全部数据文件的摘要，用于判断两次基准结果是否基于同一份数据"""
+    digest = hashlib.sha1()
+    for kind in KINDS:
+        with open(fixture_path(kind, code), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def record(code=DEFAULT_CODE):
+    """联网录制真实上游响应"""
+    import akshare
+    import requests
+
+    session = requests.Session()
+    session.headers.update(BROWSER_HEADERS)
+    r = session.get(f"http://fundgz.1234567.com.cn/js/{code}.js", timeout=20)
+    _write("fundgz", code, r.text)
+    r = session.get("https://push2.eastmoney.com/api/qt/stock/get", timeout=20, params={
+        "invt": "2", "fltt": "2", "secid": get_secid(code), "fields": "f43,f57,f58",
+    })
+    _write("push2", code, r.text)
+    r = session.get("https://push2his.eastmoney.com/api/qt/stock/kline/get", timeout=30, params={
+        "fields1": "f1,f2,f3,f4,f5,f6",
+        "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
+        "ut": "7eea3edcaed734bea9cbfc24409ed989",
+        "klt": KLINE_PERIODS["weekly"], "fqt": "0", "secid": get_secid(code), "beg": "19700101", "end": "20500101",
+    })
+    _write("push2his", code, r.text)
+    r = session.get(f"http://fund.eastmoney.com/pingzhongdata/{code}.js", timeout=30)
+    _write("pingzhongdata", code, r.text)
+    hist = akshare.fund_etf_hist_em(symbol=code, period="weekly", start_date="19700101", end_date="20500101", adjust="")
+    _write("akshare_hist", code, hist.to_csv(index=False, lineterminator="\n"))
+    nav = akshare.fund_open_fund_info_em(symbol=code, indicator="单位净值走势")
+    _write("akshare_nav", code, nav.to_csv(index=False, lineterminator="\n"))
+    _set_source(code, source="recorded", time=time.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def synthesize(code=DEFAULT_CODE, weeks=SYNTHETIC_WEEKS, seed=0):
+    """离线生成与真实响应同格式的确定性数据：周线随机游走，净值为按交易日插值后略低于收盘价"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=SYNTHETIC_END, periods=weeks, freq="W-FRI")
+    close = (1.0 + np.cumsum(rng.normal(0.002, 0.03, weeks))).clip(0.1).round(3)
+    open_ = (close * (1 + rng.normal(0, 0.01, weeks))).round(3)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, weeks)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, weeks)))
+    volume = rng.integers(100_000, 5_000_000, weeks)
+    hist = pd.DataFrame({
+        "日期": dates.strftime("%Y-%m-%d"),
+        "开盘": open_,
+        "收盘": close,
+        "最高": high.round(3),
+        "最低": low.round(3),
+        "成交量": volume,
+        "成交额": (volume * close * 100).round(1),
+        "振幅": ((high - low) / close * 100).round(2),
+        "涨跌幅": (np.diff(close, prepend=close[0]) / close * 100).round(2),
+        "涨跌额": np.diff(close, prepend=close[0]).round(3),
+        "换手率": rng.uniform(0.1, 5, weeks).round(2),
+    })[KLINE_COLUMNS]
+
+    days = pd.bdate_range(dates[0] - pd.Timedelta(days=4), dates[-1])
+    nav_values = np.interp(days.asi8, dates.asi8, close) / (1 + rng.normal(0.003, 0.006, len(days)))
+    nav = pd.DataFrame({"净值日期": days.strftime("%Y-%m-%d"), "单位净值": nav_values.round(4)})
+    nav["日增长率"] = (nav["单位净值"].pct_change().fillna(0) * 100).round(2)
+
+    price = float(close[-1])
+    _write("fundgz", code, "jsonpgz(" + json.dumps({
+        "fundcode": code, "name": "纳指ETF", "jzrq": nav["净值日期"].iloc[-1], "dwjz": f"{nav['单位净值'].iloc[-1]:.4f}",
+        "gsz": f"{price * 0.996:.4f}", "gszzl": "0.35", "gztime": f"{SYNTHETIC_END} 15:00",
+    }, ensure_ascii=False) + ");")
+    _write("push2", code, json.dumps({"rc": 0, "data": {"f43": price, "f57": code, "f58": "纳指ETF"}}, ensure_ascii=False))
+    klines = [",".join(str(v) for v in row) for row in hist.itertuples(index=False, name=None)]
+    _write("push2his", code, json.dumps({"rc": 0, "data": {"code": code, "name": "纳指ETF", "klines": klines}}, ensure_ascii=False))
+    # x 为北京时间零点的毫秒时间戳
+    stamps = pd.DatetimeIndex(days).tz_localize("Asia/Shanghai").as_unit("ms").asi8
+    trend = [{"x": int(x), "y": float(y), "equityReturn": float(g), "unitMoney": ""}
+             for x, y, g in zip(stamps, nav["单位净值"], nav["日增长率"])]
+    _write("pingzhongdata", code, 'var fS_name = "纳指ETF";var fS_code = "%s";var Data_netWorthTrend = %s;var Data_ACWorthTrend = [];'
+           % (code, json.dumps(trend, separators=(",", ":"))))
+    _write("akshare_hist", code, hist.to_csv(index=False, lineterminator="\n"))
+    _write("akshare_nav", code, nav.to_csv(index=False, lineterminator="\n"))
+    _set_source(code, source="synthetic", weeks=weeks, end=SYNTHETIC_END, seed=seed)
+
+
+def ensure_fixtures(code=DEFAULT_CODE):
+    """数据不全时报错退出 (不自动生成，以免与基于另一份数据的结果对比)"""
+    missing = [os.path.basename(fixture_path(kind, code)) for kind in KINDS if not os.path.exists(fixture_path(kind, code))]
+    if missing:
+        sys.exit(f"缺少 {code} 的基准数据: {', '.join(missing)}\n"
+                 f"请运行 python benchmarks/fixtures.py record (联网录制) 或 synthesize (合成) --code {code}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="录制或生成基准测试用的上游数据")
+    parser.add_argument("action", choices=["record", "synthesize"])
+    parser.add_argument("--code", default=DEFAULT_CODE, help="基金代码 (默认 159941)")
+    parser.add_argument("--weeks", type=int, default=SYNTHETIC_WEEKS, help="合成数据的周数 (默认 20 年)")
+    args = parser.parse_args(argv)
+    if args.action == "record":
+        record(args.code)
+    else:
+        synthesize(args.code, args.weeks)
+    print(f"已写入 {FIXTURE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
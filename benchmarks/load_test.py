@@ -0,0 +1,319 @@
+"""多会话压测：N 个模拟浏览器会话反复点击“同步并分析数据”，测量单个服务进程的承载能力
+
+默认在本机启动模拟上游 (mock_upstream.py) 与一个 Streamlit 服务进程 (每档会话数各启动一次，互不影响)。
+每个会话走与浏览器相同的 WebSocket 协议 (/_stcore/stream，protobuf BackMsg/ForwardMsg)：
+加载页面 → 全部会话就绪后测量内存 → 每次点击发送带触发值的 rerun，等到脚本运行结束
+(分析、报表渲染的全部消息都已收到) 计为一次完成。
+报告吞吐量、点击到渲染完成的 P50/P95/P99 延迟、服务进程内存与每会话内存增量、上游请求数，
+结果保存到 benchmarks/results/ 供容量规划。
+
+    python benchmarks/load_test.py --sessions 1 10 50 100 --clicks 5
+    python benchmarks/load_test.py --sessions 100 --latency 0.3 --error-rate 0.05    # 上游变慢且有错误
+    python benchmarks/load_test.py --url http://127.0.0.1:8501 --pid 12345 --sessions 20   # 压测已运行的服务
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, ROOT)
+
+from mock_upstream import FaultConfig, start_mock_upstream  # noqa: E402
+
+BUTTON_LABEL = "🔄 同步并分析数据"
+RERUN_TIMEOUT = 120      # 单次运行最长等待 (秒)
+SERVER_START_TIMEOUT = 60
+SAMPLE_INTERVAL = 0.5    # 内存采样间隔 (秒)
+
+
+def rss_mb(pid):
+    """进程常驻内存 (MB)，读取 /proc，非 Linux 或进程不存在时返回 None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, upstream_url, data_dir):
+    """启动一个 Streamlit 服务进程并等待健康检查通过"""
+    env = dict(os.environ, ETF_UPSTREAM_URL=upstream_url, ETF_DATA_DIR=data_dir)
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "app.py"),
+        "--server.headless=true", f"--server.port={port}", "--server.address=127.0.0.1",
+        "--server.fileWatcherType=none", "--browser.gatherUsageStats=false",
+    ]
+    log = open(os.path.join(data_dir, "server.log"), "w")
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Streamlit 服务启动失败，见 {log.name}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("等待 Streamlit 服务启动超时")
+
+
+def upstream_requests(mock):
+    return sum(sum(by_status.values()) for by_status in mock.snapshot().values()) if mock else None
+
+
+class Session:
+    """一个模拟浏览器会话"""
+
+    def __init__(self, url):
+        self.ws_url = url.replace("http", "ws", 1).rstrip("/") + "/_stcore/stream"
+        self.ws = None
+        self.page_hash = ""
+        self.button_id = None
+        self.errors = 0
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=RERUN_TIMEOUT)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def rerun(self, widgets=()):
+        """请求一次脚本运行并等待结束，返回 (耗时秒, 收到的字节数)"""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = self.page_hash
+        msg.rerun_script.widget_states.widgets.extend(widgets)
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        received = 0
+        while True:
+            data = await asyncio.wait_for(self.ws.recv(), RERUN_TIMEOUT)
+            received += len(data)
+            fm = ForwardMsg()
+            fm.ParseFromString(data)
+            kind = fm.WhichOneof("type")
+            if kind == "new_session":
+                self.page_hash = fm.new_session.page_script_hash
+            elif kind == "delta" and fm.delta.WhichOneof("type") == "new_element":
+                element = fm.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "button" and element.button.label == BUTTON_LABEL:
+                    self.button_id = element.button.id
+                elif element_type == "exception":
+                    self.errors += 1
+            elif kind == "script_finished":
+                if fm.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors += 1
+                if fm.script_finished != ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY:
+                    return time.perf_counter() - start, received
+
+    async def click(self):
+        widget = BackMsg().rerun_script.widget_states.widgets.add()
+        widget.id = self.button_id
+        widget.trigger_value = True
+        return await self.rerun([widget])
+
+
+async def run_level(url, sessions, clicks, think, pid):
+    """一档压测：返回各项统计"""
+    load_times, click_times, failures = [], [], 0
+    received = 0
+    ready = asyncio.Event()
+    loaded = 0
+    peak = rss_mb(pid) if pid else None
+    stop = asyncio.Event()
+
+    async def sample():
+        nonlocal peak
+        while not stop.is_set():
+            value = rss_mb(pid)
+            if value is not None:
+                peak = max(peak or 0, value)
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    async def user():
+        nonlocal failures, received, loaded
+        session = Session(url)
+        try:
+            await session.connect()
+            elapsed, size = await session.rerun()
+            load_times.append(elapsed)
+            received += size
+        except Exception as e:
+            print(f"会话加载失败: {type(e).__name__}: {e}")
+            failures += 1
+            await session.close()
+            return
+        finally:
+            loaded += 1
+            if loaded == sessions:
+                ready.set()
+        # 全部会话加载完成后再开始点击，中间测量空闲会话占用的内存
+        await ready.wait()
+        await start_clicks.wait()
+        try:
+            if session.button_id is None:
+                raise RuntimeError("页面中没有找到同步按钮")
+            for _ in range(clicks):
+                elapsed, size = await session.click()
+                click_times.append(elapsed)
+                received += size
+                if think:
+                    await asyncio.sleep(think)
+        except Exception as e:
+            print(f"会话点击失败: {type(e).__name__}: {e}")
+            failures += 1
+        finally:
+            failures += session.errors
+            await session.close()
+
+    start_clicks = asyncio.Event()
+    baseline = rss_mb(pid) if pid else None
+    sampler = asyncio.create_task(sample())
+    tasks = [asyncio.create_task(user()) for _ in range(sessions)]
+    await ready.wait()
+    idle = rss_mb(pid) if pid else None
+    started = time.perf_counter()
+    start_clicks.set()
+    await asyncio.gather(*tasks)
+    duration = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    def pct(values, q):
+        return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+    return {
+        "sessions": sessions,
+        "clicks": len(click_times),
+        "failures": failures,
+        "duration_s": round(duration, 3),
+        "throughput": round(len(click_times) / duration, 3) if duration else 0.0,
+        "p50_ms": round(pct(click_times, 50), 1),
+        "p95_ms": round(pct(click_times, 95), 1),
+        "p99_ms": round(pct(click_times, 99), 1),
+        "max_ms": round(max(click_times) * 1000, 1) if click_times else float("nan"),
+        "load_p95_ms": round(pct(load_times, 95), 1),
+        "received_mb": round(received / 1024 / 1024, 2),
+        "rss_baseline_mb": baseline and round(baseline, 1),
+        "rss_idle_mb": idle and round(idle, 1),
+        "rss_peak_mb": peak and round(peak, 1),
+        "mb_per_session": round((idle - baseline) / sessions, 2) if baseline and idle else None,
+    }
+
+
+async def warm_up(url):
+    """一个会话加载并点击一次：填充上游缓存与本地仓库，避免首档承担冷启动"""
+    session = Session(url)
+    await session.connect()
+    await session.rerun()
+    await session.click()
+    await session.close()
+
+
+def run(url, pid, sessions, clicks, think, mock):
+    asyncio.run(warm_up(url))
+    before = upstream_requests(mock)
+    result = asyncio.run(run_level(url, sessions, clicks, think, pid))
+    result["upstream_requests"] = upstream_requests(mock) - before if mock else None
+    return result
+
+
+def print_row(r):
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+    print(f"{r['sessions']:>6}{r['clicks']:>7}{r['failures']:>6}{r['throughput']:>10.2f}"
+          f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}{r['load_p95_ms']:>11.0f}"
+          f"{fmt(r['rss_idle_mb'], '>10.0f')}{fmt(r['rss_peak_mb'], '>10.0f')}{fmt(r['mb_per_session'], '>10.2f')}"
+          f"{fmt(r['upstream_requests'], '>9')}")
+
+
+def save_result(args, rows):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, time.strftime("load-%Y%m%d-%H%M%S.json"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "target": args.url or "local",
+            "clicks_per_session": args.clicks,
+            "think_s": args.think,
+            "faults": FaultConfig(args.latency, args.jitter, args.error_rate, args.burst_every, args.burst_length).to_dict(),
+            "cpus": os.cpu_count(),
+            "rows": rows,
+        }, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streamlit 多会话压测")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50, 100], help="并发会话数 (可多档)")
+    parser.add_argument("--clicks", type=int, default=5, help="每个会话点击次数 (默认 5)")
+    parser.add_argument("--think", type=float, default=0.0, help="两次点击之间的停顿 (秒)")
+    parser.add_argument("--url", help="压测已运行的服务 (不启动模拟上游与服务进程)")
+    parser.add_argument("--pid", type=int, help="配合 --url：服务进程 PID，用于测量内存")
+    faults = parser.add_argument_group("模拟上游故障注入 (见 mock_upstream.py)")
+    faults.add_argument("--latency", type=float, default=0.0)
+    faults.add_argument("--jitter", type=float, default=0.0)
+    faults.add_argument("--error-rate", type=float, default=0.0)
+    faults.add_argument("--burst-every", type=float, default=0.0)
+    faults.add_argument("--burst-length", type=float, default=0.0)
+    parser.add_argument("--no-save", action="store_true", help="不保存本次结果")
+    args = parser.parse_args(argv)
+
+    mock = None
+    if not args.url:
+        faults = FaultConfig(args.latency, args.jitter, args.error_rate, args.burst_every, args.burst_length)
+        mock_server = start_mock_upstream(faults=faults)
+        mock = mock_server.mock
+        upstream_url = f"http://127.0.0.1:{mock_server.server_address[1]}"
+
+    print(f"{'会话数':>6}{'点击':>7}{'失败':>6}{'吞吐(次/s)':>10}{'P50(ms)':>9}{'P95(ms)':>9}{'P99(ms)':>9}"
+          f"{'加载P95(ms)':>11}{'内存(MB)':>10}{'峰值(MB)':>10}{'每会话(MB)':>10}{'上游请求':>9}")
+    rows = []
+    for sessions in args.sessions:
+        if args.url:
+            row = run(args.url, args.pid, sessions, args.clicks, args.think, None)
+        else:
+            # 每档使用全新的服务进程与本地仓库，内存与缓存互不影响
+            port = free_port()
+            proc = start_server(port, upstream_url, tempfile.mkdtemp(prefix="etf-load-"))
+            try:
+                row = run(f"http://127.0.0.1:{port}", proc.pid, sessions, args.clicks, args.think, mock)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+        rows.append(row)
+        print_row(row)
+
+    if not args.no_save:
+        print(f"结果已保存: {os.path.relpath(save_result(args, rows), ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
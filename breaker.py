@@ -0,0 +1,137 @@
+"""按上游主机熔断
+
+某个主机连续失败达到阈值后熔断 (open)，冷却期内的请求立即失败，
+不再让用户等完整的超时 + 重试；冷却期结束后放行一个探测请求 (half-open)，
+成功则恢复 (closed)，失败则重新熔断。熔断状态为进程级，所有会话共享。
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from timing import span
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_THRESHOLD = 3   # 连续失败多少次后熔断
+RESET_TIMEOUT = 30      # 熔断冷却时间 (秒)，之后放行一个探测请求
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """熔断期间的快速失败"""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """请求前检查，熔断中直接抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            # 探测请求超过冷却时间仍未结束视为已丢失 (如被取消而未回报结果)，重新放行一个
+            if self.state == HALF_OPEN and (not self._probing or now - self._probe_started >= self.reset_timeout):
+                # 只放行一个探测请求，其余继续快速失败
+                self._probing = True
+                self._probe_started = now
+                return
+        raise CircuitOpenError(f"{self.name} 熔断中，请求已快速失败")
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def abandon(self):
+        """请求被取消 (没有结果)：不计成功或失败，只释放探测名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, func, *args, **kwargs):
+        """通过熔断器调用任意函数 (如 akshare 接口)，抛出异常即记为失败"""
+        self.before_request()
+        with span(f"call {self.name}", func=getattr(func, "__name__", repr(func))):
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                self.record_failure()
+                raise
+            except BaseException:
+                self.abandon()
+                raise
+        self.record_success()
+        return result
+
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """按名称 (通常为主机名) 获取进程级共享的熔断器"""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_states():
+    """返回 {名称: 状态}，供界面显示上游是否降级"""
+    with _registry_lock:
+        return {name: breaker.state for name, breaker in _breakers.items()}
+
+
+class CircuitBreakerAdapter(HTTPAdapter):
+    """在 HTTPAdapter (含重试) 外层按主机熔断：重试耗尽或返回 5xx 记为一次失败
+
+    resolve 可选，用于在选定熔断器之后改写请求地址 (如改发到本地模拟服务器)，熔断仍按原主机统计。
+    """
+
+    def __init__(self, *args, resolve=None, **kwargs):
+        self.resolve = resolve
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        breaker = get_breaker(urlsplit(request.url).hostname)
+        breaker.before_request()
+        if self.resolve is not None:
+            request.url = self.resolve(request.url)
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
@@ -0,0 +1,162 @@
+"""过期仍可用 (stale-while-revalidate) 的进程级缓存
+
+缓存过期后不再让下一个调用者阻塞等待网络：立即返回旧值并标记为过期，
+同时在后台发起唯一一次刷新；刷新失败时保留上一次的有效结果。
+缓存按 "函数全名 + 参数" 保存在模块级字典中，Streamlit 每次重跑脚本
+重新定义函数也能命中同一份缓存。同一 key 的并发抓取会合并为一次上游请求
+(single-flight)，无论多少会话同时未命中，每个 key 同时最多只有一个请求在途。
+"""
+import functools
+import threading
+import time
+
+import pandas as pd
+
+from timing import event, span
+
+_entries = {}
+_inflight = set()
+_calls = {}
+_lock = threading.Lock()
+
+
+def has_value(value):
+    """判断抓取结果是否有效 (抓取函数失败时返回 0.0 / 空表 / 空字典)"""
+    if isinstance(value, pd.DataFrame):
+        return not value.empty
+    return bool(value)
+
+
+class _Call:
+    """一次在途调用，供等待者共享结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def single_flight(key, func):
+    """同一 key 同时只执行一次 func()，其余并发调用者等待并共享其结果或异常"""
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        call.result = func()
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _calls[key]
+        call.done.set()
+    return call.result
+
+
+class CacheEntry:
+    """一条缓存记录：值、成功获取的时间与是否过期"""
+
+    def __init__(self, value, fetched_at, ttl):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.ttl = ttl
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+    @property
+    def stale(self):
+        return self.age > self.ttl
+
+
+class SWRCachedFunction:
+    """swr_cache 装饰后的函数对象"""
+
+    def __init__(self, func, ttl, default):
+        functools.update_wrapper(self, func)
+        self._func = func
+        self._name = f"{func.__module__}.{func.__qualname__}"
+        self.ttl = ttl
+        self._default = default
+
+    def __call__(self, *args):
+        entry = self.get_entry(*args)
+        # 只在这里记录命中事件：后台轮询器与实时片段频繁调用 get_entry 读快照，逐次记录会挤掉缓冲区里的请求记录
+        event(f"cache {self._func.__name__}", "miss" if entry is None else "stale" if entry.stale else "hit", args=repr(args))
+        if entry is None:
+            # 冷启动没有旧值可用，只能同步等待
+            entry = self.refresh(*args)
+        return entry.value if entry is not None else self._default()
+
+    def get_entry(self, *args):
+        """返回缓存记录，过期时立即返回旧记录并在后台刷新；从未成功时返回 None，不阻塞 (不记录命中事件)"""
+        entry = self.peek(*args)
+        if entry is not None and entry.stale:
+            self._revalidate(args)
+        return entry
+
+    def peek(self, *args):
+        """只读缓存，不触发任何抓取；没有缓存时返回 None"""
+        with _lock:
+            return _entries.get((self._name, args))
+
+    def refresh(self, *args):
+        """同步执行一次抓取 (与同 key 的在途抓取合并)，成功则更新缓存；返回最新的缓存记录 (可能为旧值或 None)"""
+        key = (self._name, args)
+        with span(f"fetch {self._func.__name__}", args=repr(args)) as s:
+            try:
+                value = single_flight(key, lambda: self._func(*args))
+            except Exception as e:
+                print(f"Cache Refresh Error ({self._name}{args}): {e}")
+                s.fail(e)
+                value = None
+            if s.outcome == "ok" and not has_value(value):
+                # 抓取函数吞掉异常后返回了默认值
+                s.outcome = "empty"
+        with _lock:
+            if has_value(value):
+                _entries[key] = CacheEntry(value, time.time(), self.ttl)
+            return _entries.get(key)
+
+    def put(self, value, *args):
+        """直接写入一条新值 (如报价推送流的最新价)，与一次成功的抓取等价"""
+        if not has_value(value):
+            return
+        with _lock:
+            _entries[(self._name, args)] = CacheEntry(value, time.time(), self.ttl)
+
+    def clear(self):
+        with _lock:
+            for key in [k for k in _entries if k[0] == self._name]:
+                del _entries[key]
+
+    def _revalidate(self, args):
+        key = (self._name, args)
+        with _lock:
+            if key in _inflight:
+                return
+            _inflight.add(key)
+
+        def run():
+            try:
+                self.refresh(*args)
+            finally:
+                with _lock:
+                    _inflight.discard(key)
+
+        threading.Thread(target=run, name=f"revalidate-{self._func.__name__}", daemon=True).start()
+
+
+def swr_cache(ttl, default=type(None)):
+    """缓存装饰器：ttl 为新鲜期 (秒)，default 为从未成功时返回值的工厂函数 (如 float、dict)"""
+    def decorator(func):
+        return SWRCachedFunction(func, ttl, default)
+    return decorator
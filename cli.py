@@ -0,0 +1,117 @@
+"""命令行入口：不启动 Streamlit，直接计算并输出决策判定，供定时任务与批处理调用
+
+    python cli.py                           # 159941 实时判定 + 最近 10 周
+    python cli.py --cost 1.250 --json       # 以 JSON 输出
+    python cli.py --watchlist 159941,513100 # 自选列表汇总
+    python cli.py --backtest --qty 1000     # 按规则回测全部历史
+    python cli.py --sweep --periods weekly,daily --top 20   # 参数网格扫描
+"""
+import argparse
+import json
+import math
+import sys
+
+from analysis import build_report, build_watchlist_report, check_market_data, format_report, parse_watchlist
+from backtest import backtest, prepare_history
+from fetchers import fetch_market_data, fetch_watchlist, get_historical_nav_map, get_kline_history, project_m20
+from sweep import DEFAULT_LOSS_CUTS, DEFAULT_PREMIUMS, DEFAULT_WINDOWS, run_sweep
+
+
+def _null_nan(value):
+    """JSON 没有 NaN (如无交易时的胜率)，输出为 null"""
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+def print_backtest(data, args):
+    stats, _, trades = backtest(data["kline"], data["nav"], qty=args.qty, cost=args.cost)
+    if args.json:
+        print(json.dumps({
+            "stats": {name: _null_nan(value) for name, value in stats.items()},
+            "trades": [{name: _null_nan(value) for name, value in row.items()} for row in trades.to_dict(orient="records")],
+        }, ensure_ascii=False, allow_nan=False))
+    else:
+        for name, value in stats.items():
+            print(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}")
+        print(trades.to_string(index=False))
+    return 0
+
+
+def print_sweep(args):
+    def floats(text):
+        return [float(v) for v in text.split(",") if v.strip()]
+
+    nav_map = get_historical_nav_map(args.code)
+    histories = {}
+    for period in [p.strip() for p in args.periods.split(",") if p.strip()]:
+        hist_df = get_kline_history(args.code, period)
+        if hist_df.empty:
+            print(f"{period} K线数据获取失败，请稍后重试。", file=sys.stderr)
+            return 1
+        histories[period] = prepare_history(hist_df, nav_map)
+
+    result = run_sweep(
+        histories,
+        floats(args.premiums),
+        [int(v) for v in floats(args.windows)],
+        floats(args.loss_cuts),
+        qty=args.qty,
+        workers=args.workers,
+        top=args.top,
+    )
+    if args.json:
+        print(result.to_json(orient="records", force_ascii=False))
+    else:
+        print(result.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="纳指ETF 溢价 + 周M20 决策判定")
+    parser.add_argument("--code", default="159941", help="基金代码 (默认 159941)")
+    parser.add_argument("--cost", type=float, default=0.0, help="买入成本 (元)，用于收益与亏损超8%% 判定")
+    parser.add_argument("--weeks", type=int, default=10, help="输出最近多少周的历史判定 (默认 10)")
+    parser.add_argument("--watchlist", help="自选列表模式：逗号或空格分隔的多个基金代码")
+    parser.add_argument("--backtest", action="store_true", help="按买入规则回测全部历史，输出统计与交易明细")
+    parser.add_argument("--qty", type=int, default=100, help="回测每次买入的股数 (默认 100)")
+    parser.add_argument("--sweep", action="store_true", help="参数扫描：在阈值网格上并行回测并排名")
+    parser.add_argument("--premiums", default=",".join(map(str, DEFAULT_PREMIUMS)), help="扫描的溢价阈值%% (逗号分隔)")
+    parser.add_argument("--windows", default=",".join(map(str, DEFAULT_WINDOWS)), help="扫描的均线窗口 (逗号分隔)")
+    parser.add_argument("--loss-cuts", default=",".join(map(str, DEFAULT_LOSS_CUTS)), help="扫描的止损线%% (逗号分隔)")
+    parser.add_argument("--periods", default="weekly", help="扫描的K线周期：weekly、daily (逗号分隔)")
+    parser.add_argument("--workers", type=int, default=None, help="扫描使用的进程数 (默认 CPU 核数)")
+    parser.add_argument("--top", type=int, default=20, help="扫描结果输出前多少名 (默认 20)")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出 (每行一条记录的数组，数值字段为数字)")
+    args = parser.parse_args(argv)
+
+    if args.sweep:
+        return print_sweep(args)
+    if args.watchlist:
+        codes = parse_watchlist(args.watchlist)
+        if not codes:
+            parser.error("--watchlist 中没有有效的 6 位基金代码")
+        results = fetch_watchlist(codes)
+        prices = results["prices"] or {}
+        live_m20 = {code: project_m20(code, prices.get(code, 0.0)) for code in codes}
+        report = build_watchlist_report(codes, results, live_m20)
+    else:
+        data = fetch_market_data(args.code)
+        if args.backtest:
+            if data["kline"].empty:
+                print("K线数据获取失败，请稍后重试。", file=sys.stderr)
+                return 1
+            return print_backtest(data, args)
+        error = check_market_data(data)
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+        report = build_report(data, args.cost, project_m20(args.code, data["price"])).head(args.weeks + 1)
+
+    if args.json:
+        print(report.to_json(orient="records", force_ascii=False))
+    else:
+        print(format_report(report).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
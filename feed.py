@@ -0,0 +1,186 @@
+"""报价推送流 (可选子系统)
+
+保持一条到上游的长连接，逐笔收到报价后经进程内发布/订阅分发给所有订阅者
+(缓存、页面会话)，报价可以亚秒级更新，而上游请求量不随会话数增长。
+
+数据源可插拔，通过环境变量 ETF_QUOTE_FEED 选择，未设置时不启用：
+    sse                          东财 push2 SSE 推送 (服务端推送增量字段)
+    replay:ticks.jsonl[@倍速]     本地回放 (每行 {"ts": 秒, "price": 价格})，用于测试与演示
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from net import get_robust_session
+from quotes import get_secid
+
+FEED_ENV = "ETF_QUOTE_FEED"
+SSE_URL = "https://push2.eastmoney.com/api/qt/stock/sse"
+SSE_READ_TIMEOUT = 60    # 超过该时间 (秒) 没有任何数据 (含心跳) 视为断线
+RECONNECT_DELAY = 1      # 断线后的首次重连间隔 (秒)，之后指数退避
+RECONNECT_MAX_DELAY = 30
+
+QuoteTick = namedtuple("QuoteTick", ["code", "price", "ts", "source"])
+
+
+class QuoteBus:
+    """进程内发布/订阅：保存每个代码的最新报价，并把每笔新报价推送给所有订阅者"""
+
+    def __init__(self):
+        self._latest = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """注册回调 callback(tick)，返回取消订阅的函数"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def publish(self, tick):
+        with self._lock:
+            self._latest[tick.code] = tick
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(tick)
+            except Exception as e:
+                print(f"Quote Subscriber Error: {e}")
+
+    def latest(self, code):
+        with self._lock:
+            return self._latest.get(code)
+
+
+class QuoteFeed:
+    """报价源接口：run 阻塞运行，每收到一笔报价调用 on_tick(tick)，stop 事件置位后返回；
+    连接断开时抛出异常，由 QuoteStream 负责重连"""
+
+    name = ""
+
+    def run(self, code, on_tick, stop):
+        raise NotImplementedError
+
+
+class EastmoneySSEFeed(QuoteFeed):
+    """东财 push2 SSE：首条消息为完整字段，之后只推送变化的字段"""
+
+    name = "东财SSE"
+
+    def __init__(self, url=SSE_URL):
+        self.url = url
+        self._session = get_robust_session()
+
+    def run(self, code, on_tick, stop):
+        params = {"invt": "2", "fltt": "2", "secid": get_secid(code), "fields": "f43,f57,f58"}
+        # 建立连接走带按主机熔断的 Session，上游熔断期间快速失败，由 QuoteStream 退避重连
+        with self._session.get(self.url, params=params, stream=True, timeout=(10, SSE_READ_TIMEOUT)) as r:
+            r.raise_for_status()
+            # 增量消息只有几十字节，按默认 512 字节分块读取会一直等到攒够一块才处理，这里逐字节读取 (数据量很小)
+            for line in r.iter_lines(chunk_size=1, decode_unicode=True):
+                if stop.is_set():
+                    return
+                if not line or not line.startswith("data:"):
+                    continue
+                data = json.loads(line[5:]).get("data") or {}
+                price = data.get("f43")
+                if isinstance(price, (int, float)) and price > 0:
+                    on_tick(QuoteTick(code, float(price), time.time(), self.name))
+        raise ConnectionError("SSE 连接被服务端关闭")
+
+
+class ReplayFeed(QuoteFeed):
+    """按原始时间间隔 (可加速) 回放 JSONL 报价文件，文件结束后从头循环"""
+
+    name = "回放"
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+
+    def run(self, code, on_tick, stop):
+        with open(self.path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        if not rows:
+            raise ValueError(f"回放文件为空: {self.path}")
+        while not stop.is_set():
+            prev_ts = rows[0]["ts"]
+            for row in rows:
+                if stop.wait(max(0.0, (row["ts"] - prev_ts) / self.speed)):
+                    return
+                prev_ts = row["ts"]
+                on_tick(QuoteTick(row.get("code", code), float(row["price"]), time.time(), self.name))
+
+
+def create_feed(spec):
+    """由配置字符串创建报价源，空字符串返回 None (不启用推送)"""
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    if spec == "sse":
+        return EastmoneySSEFeed()
+    if spec.startswith("replay:"):
+        path, _, speed = spec[len("replay:"):].partition("@")
+        return ReplayFeed(path, float(speed) if speed else 1.0)
+    raise ValueError(f"未知的报价推送源: {spec}")
+
+
+class QuoteStream:
+    """后台线程运行一个报价源并发布到 QuoteBus，断线后指数退避重连"""
+
+    def __init__(self, code, feed, bus=None):
+        self.code = code
+        self.feed = feed
+        self.bus = bus or QuoteBus()
+        self.connected = False
+        self.ticks = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"quote-stream-{code}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self):
+        return self.bus.latest(self.code)
+
+    def _on_tick(self, tick):
+        self.connected = True
+        self.ticks += 1
+        self.bus.publish(tick)
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        while not self._stop.is_set():
+            ticks = self.ticks
+            try:
+                self.feed.run(self.code, self._on_tick, self._stop)
+            except Exception as e:
+                print(f"Quote Stream Error ({self.feed.name}): {e}")
+            self.connected = False
+            # 本次连接收到过报价则从最短间隔重新开始退避
+            delay = RECONNECT_DELAY if self.ticks > ticks else min(delay * 2, RECONNECT_MAX_DELAY)
+            self._stop.wait(delay)
+
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def get_quote_stream(code="159941"):
+    """进程级共享的报价推送流；未配置 ETF_QUOTE_FEED 时返回 None"""
+    with _streams_lock:
+        if code not in _streams:
+            feed = create_feed(os.environ.get(FEED_ENV))
+            _streams[code] = QuoteStream(code, feed).start() if feed else None
+        return _streams[code]
@@ -0,0 +1,362 @@
+"""行情数据获取 (不依赖 Streamlit，可被页面、命令行与批处理任务共用)
+
+所有抓取函数都带进程级的过期仍可用缓存 (见 cache.py)，失败时返回 0.0 / 空表 / 空字典。
+"""
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+
+import store
+from breaker import get_breaker
+from cache import swr_cache
+from indicators import MovingAverageSeries
+from net import get_async_client, get_robust_session, upstream_override
+from poller import fetch_concurrently
+from quotes import get_quote_chain, get_secid
+from timing import note_error, span
+
+# === 网络请求增强模块 (核心修复，见 net.py) ===
+# 初始化全局 session 与异步客户端 (fundgz / push2 等手写接口走异步连接池)
+http = get_robust_session()
+aio = get_async_client()
+
+# === 并发抓取配置 ===
+FETCH_MAX_WORKERS = 4   # 并发抓取的线程上限
+FETCH_DEADLINE = 25     # 单次刷新中每个数据源的最长等待时间 (秒)，覆盖 15~20 秒的请求超时
+WATCHLIST_MAX_WORKERS = 8   # 自选列表批量抓取的线程上限
+
+_pools = {}
+
+def get_fetch_pool(max_workers):
+    """进程级共享的抓取线程池，避免重复新建线程"""
+    if max_workers not in _pools:
+        _pools[max_workers] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"fetch-{max_workers}")
+    return _pools[max_workers]
+
+# push2his K线周期参数与返回字段 (与 akshare fund_etf_hist_em 一致)
+KLINE_PERIODS = {"daily": "101", "weekly": "102", "monthly": "103"}
+KLINE_COLUMNS = ["日期", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"]
+
+# 周线移动平均的增量状态：{基金代码: MovingAverageSeries}
+MA_WINDOWS = (20,)
+_ma_series = {}
+_ma_lock = threading.Lock()
+
+def _akshare():
+    """按需导入 akshare：其依赖树很大，只在直连接口失败时才加载，缩短冷启动时间
+
+    设置了上游地址覆盖 (压测对接模拟服务器) 时 akshare 仍会访问真实上游，因此不启用兜底。
+    """
+    if upstream_override():
+        raise RuntimeError("已设置上游地址覆盖，不使用 akshare 兜底")
+    import akshare
+    return akshare
+
+# === 数据获取函数 (过期仍可用缓存 + 增强网络) ===
+
+@swr_cache(ttl=60, default=float)
+def get_tiantian_valuation(code="159941"):
+    """获取天天基金实时估值"""
+    try:
+        # 使用异步连接池，超时设置为 15秒
+        r = aio.run(aio.get(valuation_url(code), timeout=15))
+        return parse_valuation(r)
+    except Exception as e:
+        # 记录错误但不阻断，返回0让流程继续
+        print(f"Valuation Error: {e}")
+        note_error(e)
+        return 0.0
+
+@swr_cache(ttl=60, default=dict)
+def get_valuations(codes):
+    """在同一个事件循环中并发获取多只基金的估值，返回 {代码: 估值}"""
+    responses = aio.run(aio.gather([aio.get(valuation_url(code), timeout=15) for code in codes]))
+    valuations = {}
+    for code, r in zip(codes, responses):
+        if isinstance(r, Exception):
+            print(f"Valuation Error ({code}): {r}")
+            continue
+        val = parse_valuation(r)
+        if val > 0:
+            valuations[code] = val
+    return valuations
+
+def valuation_url(code):
+    timestamp = int(time.time() * 1000)
+    return f"http://fundgz.1234567.com.cn/js/{code}.js?rt={timestamp}"
+
+def parse_valuation(r):
+    """解析天天基金 jsonpgz(...) 响应，优先取估算净值 gsz，失败返回 0.0"""
+    with span("parse valuation") as s:
+        s.bytes = len(r.content)
+        if r.status_code == 200:
+            match = re.search(r'jsonpgz\((.*?)\);', r.text)
+            if match:
+                data = json.loads(match.group(1))
+                val = data.get("gsz", data.get("dwjz", None))
+                if val: return float(val)
+        return 0.0
+
+@swr_cache(ttl=60, default=float)
+def get_realtime_price(code="159941"):
+    """获取场内实时价格 (多数据源故障转移，最快的健康源优先，超时对冲下一个源)"""
+    try:
+        price, source = aio.run(get_quote_chain().fetch(aio, code))
+        return price
+    except Exception as e:
+        print(f"Price Error: {e}")
+        note_error(e)
+        return 0.0
+
+@swr_cache(ttl=60, default=dict)
+def get_realtime_prices(codes):
+    """一次 ulist 请求批量获取多只基金的场内实时价格，返回 {代码: 现价}"""
+    prices = {}
+    try:
+        url = "https://push2.eastmoney.com/api/qt/ulist.np/get"
+        params = {
+            "invt": "2",
+            "fltt": "2",
+            "secids": ",".join(get_secid(code) for code in codes),
+            "fields": "f12,f43",
+        }
+        r = aio.run(aio.get(url, params=params, timeout=20))
+        diff = (r.json().get("data") or {}).get("diff") or []
+        if isinstance(diff, dict):
+            diff = diff.values()
+        for item in diff:
+            p_str = str(item.get("f43", "-"))
+            if p_str not in ("-", ""):
+                prices[str(item.get("f12"))] = float(p_str)
+    except Exception as e:
+        print(f"Batch Price Error: {e}")
+        note_error(e)
+    # 批量接口缺失的代码逐个走故障转移链补齐
+    missing = [code for code in codes if code not in prices]
+    if missing:
+        chain = get_quote_chain()
+        results = aio.run(aio.gather([chain.fetch(aio, code) for code in missing]))
+        for code, result in zip(missing, results):
+            if not isinstance(result, Exception):
+                prices[code] = result[0]
+    return prices
+
+def fetch_nav_since(code, start_date):
+    """从东财净值接口增量拉取 start_date (含) 之后的单位净值"""
+    url = "https://api.fund.eastmoney.com/f10/lsjz"
+    headers = {"Referer": "https://fundf10.eastmoney.com/"}
+    items = []
+    page = 1
+    while True:
+        params = {"fundCode": code, "pageIndex": page, "pageSize": 20, "startDate": start_date, "endDate": ""}
+        r = http.get(url, params=params, headers=headers, timeout=15)
+        data_json = r.json()
+        batch = (data_json.get("Data") or {}).get("LSJZList") or []
+        items.extend(batch)
+        if not batch or len(items) >= int(data_json.get("TotalCount") or 0):
+            break
+        page += 1
+    with span("parse nav lsjz", rows=len(items)):
+        return pd.DataFrame({
+            "净值日期": [item.get("FSRQ") for item in items],
+            "单位净值": [item.get("DWJZ") for item in items],
+        })
+
+def fetch_nav_full(code):
+    """直连天天基金 pingzhongdata 脚本获取全部单位净值 (即 akshare 单位净值走势的数据源)"""
+    url = f"http://fund.eastmoney.com/pingzhongdata/{code}.js"
+    r = http.get(url, params={"v": int(time.time() * 1000)}, timeout=20)
+    with span("parse nav pingzhongdata") as s:
+        s.bytes = len(r.content)
+        match = re.search(r'Data_netWorthTrend\s*=\s*(\[.*?\]);', r.text, re.S)
+        if not match:
+            raise ValueError(f"pingzhongdata 中没有净值数据: {code}")
+        trend = json.loads(match.group(1))
+        # x 为北京时间零点的毫秒时间戳
+        dates = pd.to_datetime([item["x"] for item in trend], unit="ms", utc=True).tz_convert("Asia/Shanghai")
+        return pd.DataFrame({
+            "净值日期": dates.strftime("%Y-%m-%d"),
+            "单位净值": [item["y"] for item in trend],
+        })
+
+def fetch_kline_em(code, period="weekly", start_date="19700101"):
+    """直连东财 push2his K线接口 (即 akshare fund_etf_hist_em 的数据源)，列名与 akshare 一致"""
+    url = "https://push2his.eastmoney.com/api/qt/stock/kline/get"
+    params = {
+        "fields1": "f1,f2,f3,f4,f5,f6",
+        "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
+        "ut": "7eea3edcaed734bea9cbfc24409ed989",
+        "klt": KLINE_PERIODS[period],
+        "fqt": "0",
+        "secid": get_secid(code),
+        "beg": start_date,
+        "end": "20500101",
+    }
+    r = http.get(url, params=params, timeout=20)
+    with span("parse kline push2his", period=period) as s:
+        s.bytes = len(r.content)
+        klines = (r.json().get("data") or {}).get("klines")
+        if klines is None:
+            raise ValueError(f"push2his 没有返回K线: {code}")
+        df = pd.DataFrame([line.split(",") for line in klines], columns=KLINE_COLUMNS)
+        df[KLINE_COLUMNS[1:]] = df[KLINE_COLUMNS[1:]].apply(pd.to_numeric, errors="coerce")
+        return df
+
+def fetch_kline(code, period, start_date):
+    """获取K线：优先直连接口，失败时才按需加载 akshare 兜底"""
+    try:
+        return fetch_kline_em(code, period, start_date)
+    except Exception as e:
+        print(f"K-Line Direct Error: {e}")
+    # K线数据量大，更容易超时，这里不做特殊处理，依赖 akshare 自身的重试
+    df = get_breaker("akshare").call(
+        _akshare().fund_etf_hist_em,
+        symbol=code,
+        period=period,
+        start_date=start_date,
+        end_date="20500101",
+        adjust="",
+    )
+    return df.loc[:, ~df.columns.duplicated()]
+
+def fetch_nav(code):
+    """获取全部单位净值：优先直连接口，失败时才按需加载 akshare 兜底"""
+    try:
+        return fetch_nav_full(code)
+    except Exception as e:
+        print(f"NAV Direct Error: {e}")
+    return get_breaker("akshare").call(_akshare().fund_open_fund_info_em, symbol=code, indicator="单位净值走势")
+
+def sync_nav_history(code):
+    """同步历史净值到本地仓库：首次全量下载，之后只追加最后一条记录之后的新净值"""
+    last_date = store.last_nav_date(code)
+    try:
+        if last_date is None:
+            df = fetch_nav(code)
+        else:
+            df = fetch_nav_since(code, last_date)
+        store.upsert_nav(code, df)
+    except Exception as e:
+        if last_date is None:
+            raise
+        # 上游异常时继续使用本地已有数据
+        print(f"NAV Sync Error: {e}")
+    return store.load_nav(code)
+
+def sync_kline_history(code, period="weekly"):
+    """同步K线到本地仓库：从最后一根K线所在周期的起点重新拉取，覆盖尚未走完的周期"""
+    last_date = store.last_kline_date(code, period)
+    if last_date is None:
+        start = None
+    elif period == "weekly":
+        last = pd.Timestamp(last_date)
+        start = (last - pd.Timedelta(days=last.weekday())).strftime("%Y-%m-%d")
+    else:
+        start = last_date
+    try:
+        df = fetch_kline(code, period, start.replace("-", "") if start else "19700101")
+        store.upsert_kline(code, period, df, replace_from=start)
+    except Exception as e:
+        if last_date is None:
+            raise
+        print(f"K-Line Sync Error: {e}")
+    return store.load_kline(code, period)
+
+@swr_cache(ttl=3600, default=dict)
+def get_historical_nav_map(code="159941"):
+    try:
+        df = sync_nav_history(code)
+        nav_map = dict(zip(df['净值日期'], df['单位净值']))
+        return nav_map
+    except Exception as e:
+        note_error(e)
+        return {}
+
+def update_moving_averages(code, hist_df, window=20):
+    """把按日期升序的周线同步到该代码的均线状态 (只计算新增或变动的K线)，返回该窗口的均线数组"""
+    dates = hist_df['日期'].tolist()
+    closes = pd.to_numeric(hist_df['收盘'], errors='coerce').tolist()
+    with _ma_lock:
+        series = _ma_series.get(code)
+        if series is None or not series.sync(dates, closes):
+            series = MovingAverageSeries(MA_WINDOWS)
+            series.sync(dates, closes)
+            _ma_series[code] = series
+        return series.array(window)
+
+def project_m20(code, price, today=None):
+    """以实时价作为本周收盘价的周M20 预估，返回 (预估周M20, 上周M20)；均线状态不足时返回 None
+
+    最后一根周线与 today 同属一周 (尚未走完) 时用实时价替换其收盘价，
+    否则视为新一周刚开始、追加一根。只读取增量状态，每次报价更新都可以调用。
+    """
+    if not price or price <= 0:
+        return None
+    today = today or date.today()
+    with _ma_lock:
+        series = _ma_series.get(code)
+        if series is None or len(series) < 2:
+            return None
+        same_week = date.fromisoformat(series.last_date).isocalendar()[:2] == today.isocalendar()[:2]
+        m20 = series.projected(price, same_period=same_week)
+        prev_m20 = series.averages[20][-2] if same_week else series.averages[20][-1]
+    if m20 != m20 or prev_m20 != prev_m20:  # NaN：上市不足 20 周
+        return None
+    return m20, prev_m20
+
+@swr_cache(ttl=300, default=pd.DataFrame)
+def get_kline_data(code="159941"):
+    try:
+        hist_df = sync_kline_history(code, "weekly")
+        if hist_df.empty:
+            return hist_df
+        hist_df['M20'] = update_moving_averages(code, hist_df)
+        # 仓库按日期升序返回，直接倒序即可
+        return hist_df.iloc[::-1].reset_index(drop=True)
+    except Exception as e:
+        print(f"K-Line Error: {e}")
+        note_error(e)
+        return pd.DataFrame()
+
+@swr_cache(ttl=300, default=pd.DataFrame)
+def get_kline_history(code="159941", period="weekly"):
+    """按周期 (weekly / daily) 获取同步后的全部K线 (日期升序，不含均线)，供回测与参数扫描使用"""
+    try:
+        return sync_kline_history(code, period)
+    except Exception as e:
+        print(f"K-Line Error ({period}): {e}")
+        note_error(e)
+        return pd.DataFrame()
+
+# === 组合抓取 ===
+
+def market_sources():
+    """单只基金分析所需的数据源：{名称: (缓存抓取函数, 失败时的默认值)}"""
+    return {
+        "valuation": (get_tiantian_valuation, 0.0),
+        "price": (get_realtime_price, 0.0),
+        "kline": (get_kline_data, pd.DataFrame()),
+        "nav": (get_historical_nav_map, {}),
+    }
+
+def fetch_market_data(code="159941"):
+    """并发获取单只基金的估值、现价、K线与历史净值，返回 {名称: 结果}"""
+    sources = market_sources()
+    calls = {name: (lambda func=func: func(code)) for name, (func, _) in sources.items()}
+    results = fetch_concurrently(get_fetch_pool(FETCH_MAX_WORKERS), calls, FETCH_DEADLINE)
+    return {name: results[name] if results[name] is not None else default for name, (_, default) in sources.items()}
+
+def fetch_watchlist(codes):
+    """自选列表：报价与估值各一次批量/异步请求，K线有界并发获取"""
+    calls = {
+        "prices": lambda: get_realtime_prices(tuple(codes)),
+        "valuations": lambda: get_valuations(tuple(codes)),
+    }
+    for code in codes:
+        calls[("kline", code)] = lambda code=code: get_kline_data(code)
+    return fetch_concurrently(get_fetch_pool(WATCHLIST_MAX_WORKERS), calls, FETCH_DEADLINE)
@@ -0,0 +1,156 @@
+"""移动平均的增量状态
+
+K线按日期升序逐根追加，每个窗口只保存窗口内的收盘价与累计和：
+追加新周期或更新尚未走完的当前周期都是 O(1)，不必每次刷新都对全部历史重算 rolling。
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+RESUM_INTERVAL = 1000   # 每更新多少次用窗口内数值重新求和一次，消除累计和的浮点误差
+
+
+class RollingMean:
+    """固定窗口的滚动均值：窗口未满或含缺失值时为 NaN (与 pandas rolling 一致)"""
+
+    def __init__(self, window):
+        self.window = window
+        self._values = deque()
+        self._sum = 0.0
+        self._missing = 0
+        self._updates = 0
+
+    def _add(self, value):
+        if math.isnan(value):
+            self._missing += 1
+        else:
+            self._sum += value
+
+    def _remove(self, value):
+        if math.isnan(value):
+            self._missing -= 1
+        else:
+            self._sum -= value
+
+    def _tick(self):
+        self._updates += 1
+        if self._updates >= RESUM_INTERVAL:
+            self._updates = 0
+            self._sum = math.fsum(v for v in self._values if not math.isnan(v))
+
+    def append(self, value):
+        """追加一个新周期，返回追加后的均值"""
+        value = float(value)
+        self._values.append(value)
+        self._add(value)
+        if len(self._values) > self.window:
+            self._remove(self._values.popleft())
+        self._tick()
+        return self.value
+
+    def update_last(self, value):
+        """更新最后一个周期 (当前尚未走完的周期) 的数值，返回更新后的均值"""
+        value = float(value)
+        self._remove(self._values[-1])
+        self._values[-1] = value
+        self._add(value)
+        self._tick()
+        return self.value
+
+    def _mean(self, total, count, missing):
+        if count < self.window or missing:
+            return float("nan")
+        return total / self.window
+
+    @property
+    def value(self):
+        return self._mean(self._sum, len(self._values), self._missing)
+
+    def peek_update(self, value):
+        """假设最后一个周期的数值改为 value 时的均值 (不修改状态)"""
+        if not self._values:
+            return float("nan")
+        last = self._values[-1]
+        value = float(value)
+        total = self._sum - (0.0 if math.isnan(last) else last) + (0.0 if math.isnan(value) else value)
+        missing = self._missing - math.isnan(last) + math.isnan(value)
+        return self._mean(total, len(self._values), missing)
+
+    def peek_append(self, value):
+        """假设追加一个数值为 value 的新周期时的均值 (不修改状态)"""
+        value = float(value)
+        total = self._sum + (0.0 if math.isnan(value) else value)
+        missing = self._missing + math.isnan(value)
+        count = len(self._values) + 1
+        if count > self.window:
+            first = self._values[0]
+            total -= 0.0 if math.isnan(first) else first
+            missing -= math.isnan(first)
+            count = self.window
+        return self._mean(total, count, missing)
+
+
+class MovingAverageSeries:
+    """按日期升序维护的收盘价序列及其各窗口移动平均，支持增量追加/更新"""
+
+    def __init__(self, windows=(20,)):
+        self.windows = tuple(windows)
+        self.dates = []
+        self.averages = {w: [] for w in self.windows}
+        self._rolling = {w: RollingMean(w) for w in self.windows}
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def last_date(self):
+        return self.dates[-1] if self.dates else None
+
+    def update(self, date, close):
+        """同一日期视为更新最后一根K线，更晚的日期视为追加新K线"""
+        if self.dates and date == self.dates[-1]:
+            for w, rolling in self._rolling.items():
+                self.averages[w][-1] = rolling.update_last(close)
+        elif not self.dates or date > self.dates[-1]:
+            self.dates.append(date)
+            for w, rolling in self._rolling.items():
+                self.averages[w].append(rolling.append(close))
+        else:
+            raise ValueError(f"K线日期早于已有数据: {date} < {self.dates[-1]}")
+
+    def sync(self, dates, closes):
+        """与按日期升序的完整K线对齐：只处理最后已知日期 (含) 之后的K线
+
+        dates 为 YYYY-MM-DD 字符串序列；已有部分与 dates 不一致 (如本地仓库被重建) 时返回 False，
+        调用方应重新构建。
+        """
+        n = len(self.dates)
+        if n:
+            # 当前周期的K线可能被同一周内更晚的日期替换 (周线日期为该周最后一个交易日)
+            if len(dates) < n or dates[0] != self.dates[0] or (n > 1 and dates[n - 2] != self.dates[n - 2]):
+                return False
+            if dates[n - 1] != self.dates[-1]:
+                self._replace_last(dates[n - 1], closes[n - 1])
+            else:
+                self.update(dates[n - 1], closes[n - 1])
+        for i in range(n, len(dates)):
+            self.update(dates[i], closes[i])
+        return True
+
+    def _replace_last(self, date, close):
+        self.dates[-1] = date
+        for w, rolling in self._rolling.items():
+            self.averages[w][-1] = rolling.update_last(close)
+
+    def array(self, window=20):
+        return np.asarray(self.averages[window], dtype=np.float64)
+
+    def projected(self, price, same_period=True, window=20):
+        """以实时价格作为当前周期收盘时的均值 (不修改状态)
+
+        same_period=True 表示最后一根K线就是当前尚未走完的周期，用 price 替换其收盘价；
+        否则视为新周期刚开始，在末尾追加 price。
+        """
+        rolling = self._rolling[window]
+        return rolling.peek_update(price) if same_period else rolling.peek_append(price)
@@ -0,0 +1,207 @@
+"""Prometheus 文本格式的运行指标
+
+由 timing.py 的耗时记录汇总出计数器与直方图 (每个上游接口的请求数、耗时、重试、字节，
+各缓存函数的命中/过期/未命中，抓取、解析、分析、渲染耗时)，
+熔断器状态与报价源健康度在抓取指标时实时读取。
+在独立线程中提供 HTTP 接口，抓取指标不经过 Streamlit 页面。Streamlit 只在浏览器会话打开页面时
+才执行 app.py，因此由 serve.py 在进程启动时开启接口，再在同一进程中启动 Streamlit：
+
+    python serve.py --metrics-port 9108
+    curl http://127.0.0.1:9108/metrics
+
+直接 streamlit run app.py 并设置 ETF_METRICS_PORT 时，接口在第一个会话打开页面后才开始监听。
+"""
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from breaker import CLOSED, HALF_OPEN, OPEN, breaker_states
+from quotes import get_quote_chain
+from timing import add_listener
+
+METRICS_PORT_ENV = "ETF_METRICS_PORT"
+METRICS_HOST = os.environ.get("ETF_METRICS_HOST", "127.0.0.1")
+
+# 上游请求耗时分桶 (秒)，覆盖 15~20 秒的请求超时
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 20, 30)
+# 缓存抓取 (含重试与回退) 与本地计算的耗时分桶 (秒)
+FETCH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+CIRCUIT_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames, buckets):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            counts, total = self._series.get(labels, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[labels] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', _number(bound))])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {counts[-1]}")
+        return lines
+
+
+upstream_requests = Counter("etf_upstream_requests_total", "上游请求次数 (按结果)", ("host", "path", "outcome"))
+upstream_duration = Histogram("etf_upstream_request_duration_seconds", "上游请求耗时 (含重试)", ("host", "path"), REQUEST_BUCKETS)
+upstream_retries = Counter("etf_upstream_retries_total", "上游请求的重试次数", ("host", "path"))
+upstream_bytes = Counter("etf_upstream_response_bytes_total", "上游响应字节数", ("host", "path"))
+cache_lookups = Counter("etf_cache_lookups_total", "缓存读取次数 (hit/stale/miss)", ("fetcher", "result"))
+fetch_duration = Histogram("etf_fetch_duration_seconds", "缓存抓取函数一次刷新的耗时", ("fetcher", "outcome"), FETCH_BUCKETS)
+stage_duration = Histogram("etf_stage_duration_seconds", "解析、分析与渲染耗时", ("stage",), STAGE_BUCKETS)
+
+COLLECTORS = [upstream_requests, upstream_duration, upstream_retries, upstream_bytes, cache_lookups, fetch_duration, stage_duration]
+
+
+def observe_span(s):
+    """把一条耗时记录计入对应的指标"""
+    kind, _, target = s.name.partition(" ")
+    if kind == "http":
+        labels = (target, s.attrs.get("path", ""))
+    elif kind == "call":
+        labels = (target, s.attrs.get("func", ""))
+    elif kind == "cache":
+        cache_lookups.inc((target, s.outcome))
+        return
+    elif kind == "fetch":
+        fetch_duration.observe((target, s.outcome), s.duration)
+        return
+    elif kind in ("parse", "analysis", "render"):
+        stage_duration.observe((s.name,), s.duration)
+        return
+    else:
+        return
+    upstream_requests.inc(labels + (s.outcome,))
+    upstream_duration.observe(labels, s.duration)
+    if s.retries:
+        upstream_retries.inc(labels, s.retries)
+    if s.bytes:
+        upstream_bytes.inc(labels, s.bytes)
+
+
+def _gauge(name, help, samples):
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    lines.extend(f"{name}{labels} {_number(value)}" for labels, value in samples)
+    return lines
+
+
+def render_metrics():
+    """当前全部指标的 Prometheus 文本格式"""
+    lines = []
+    for collector in COLLECTORS:
+        lines.extend(collector.render())
+
+    lookups = {}
+    for (fetcher, result), count in cache_lookups.values().items():
+        hits, total = lookups.get(fetcher, (0, 0))
+        lookups[fetcher] = (hits + (count if result == "hit" else 0), total + count)
+    lines.extend(_gauge("etf_cache_hit_ratio", "缓存新鲜命中率 (hit / 全部读取)", [
+        (_labels(("fetcher",), (fetcher,)), hits / total) for fetcher, (hits, total) in sorted(lookups.items()) if total
+    ]))
+
+    lines.extend(_gauge("etf_circuit_state", "熔断器状态 (0=closed, 1=half_open, 2=open)", [
+        (_labels(("breaker",), (name,)), CIRCUIT_VALUES[state]) for name, state in sorted(breaker_states().items())
+    ]))
+
+    providers = get_quote_chain().providers
+    lines.extend(_gauge("etf_quote_provider_latency_seconds", "报价源平均延迟 (指数平滑)", [
+        (_labels(("provider",), (p.name,)), p.latency) for p in providers if p.latency is not None
+    ]))
+    lines.extend(_gauge("etf_quote_provider_success_ratio", "报价源近期成功率", [
+        (_labels(("provider",), (p.name,)), p.success_rate) for p in providers
+    ]))
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=METRICS_HOST):
+    """开始汇总指标并在后台线程提供 /metrics；未指定端口且未设置 ETF_METRICS_PORT 时不启动，返回 None"""
+    global _server
+    if port is None:
+        port = os.environ.get(METRICS_PORT_ENV) or None
+    if port is None:
+        return None
+    with _server_lock:
+        if _server is None:
+            add_listener(observe_span)
+            _server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server
@@ -0,0 +1,373 @@
+"""本地模拟行情服务器 (压测用)
+
+模拟页面用到的全部上游接口，数据按基金代码确定性生成 (同一代码每次启动都相同)：
+    fundgz.1234567.com.cn   /js/<代码>.js                 估值 jsonpgz(...)
+    push2.eastmoney.com     /api/qt/stock/get             现价 f43
+                            /api/qt/ulist.np/get          批量现价
+                            /api/qt/stock/sse             现价推送 (SSE)
+    push2his.eastmoney.com  /api/qt/stock/kline/get       日/周/月K线 (akshare fund_etf_hist_em 的数据源)
+    fund.eastmoney.com      /pingzhongdata/<代码>.js       全部单位净值 (akshare 单位净值走势的数据源)
+    api.fund.eastmoney.com  /f10/lsjz                     增量净值 (分页)
+    hq.sinajs.cn / qt.gtimg.cn                            新浪 / 腾讯报价
+
+请求路径为 /<原主机名>/<原路径>，与 net.py 的上游地址覆盖配合使用。
+数据源可替换为录制的响应 (RecordedData，基准测试 benchmarks/bench_pipeline.py 使用)；failing 中的主机一律返回 404。
+可注入延迟、随机 500 错误与周期性的 503 突发，用于观察重试、熔断与缓存在高并发下的表现；
+GET /_stats 返回各主机的请求计数，GET/POST /_config 查看或修改故障注入参数。
+
+    python mock_upstream.py --port 8900 --latency 0.2 --jitter 0.1 --error-rate 0.05 --burst-every 60 --burst-length 5
+    ETF_UPSTREAM_URL=http://127.0.0.1:8900 streamlit run app.py
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from store import KLINE_COLUMNS
+
+DEFAULT_PORT = 8900
+DEFAULT_YEARS = 10
+SSE_INTERVAL = 1.0   # 推送间隔 (秒)
+
+KLINE_FIELDS = list(KLINE_COLUMNS)
+
+
+class FaultConfig:
+    """故障注入参数：每个请求的延迟 latency ± jitter 秒，概率 error_rate 返回 500；
+    burst_every > 0 时每隔 burst_every 秒有 burst_length 秒全部返回 503"""
+
+    FIELDS = ("latency", "jitter", "error_rate", "burst_every", "burst_length")
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, burst_every=0.0, burst_length=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.started = time.monotonic()
+
+    def update(self, values):
+        for key in self.FIELDS:
+            if key in values:
+                setattr(self, key, float(values[key]))
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    def delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def in_burst(self):
+        if self.burst_every <= 0:
+            return False
+        return (time.monotonic() - self.started) % self.burst_every < self.burst_length
+
+    def status(self):
+        """本次请求应返回的错误状态码，正常时返回 None"""
+        if self.in_burst():
+            return 503
+        if self.error_rate and random.random() < self.error_rate:
+            return 500
+        return None
+
+
+class MarketData:
+    """一只基金的模拟数据：逐日K线 (随机游走，截止今天) 与前一交易日及之前的单位净值"""
+
+    def __init__(self, code, years=DEFAULT_YEARS):
+        self.code = code
+        rng = np.random.default_rng(zlib.crc32(code.encode()))
+        days = pd.bdate_range(end=date.today(), periods=years * 252)
+        n = len(days)
+        close = (1.0 + np.cumsum(rng.normal(0.0004, 0.012, n))).clip(0.1)
+        open_ = close * (1 + rng.normal(0, 0.004, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n)))
+        volume = rng.integers(10_000, 1_000_000, n)
+        self.daily = pd.DataFrame({
+            "日期": days,
+            "开盘": open_.round(3),
+            "收盘": close.round(3),
+            "最高": high.round(3),
+            "最低": low.round(3),
+            "成交量": volume,
+            "成交额": (volume * close * 100).round(1),
+            "换手率": rng.uniform(0.1, 5, n).round(2),
+        })
+        nav = close[:-1] / (1 + rng.normal(0.003, 0.006, n - 1))
+        self.nav = pd.DataFrame({"净值日期": days[:-1].strftime("%Y-%m-%d"), "单位净值": nav.round(4)})
+        self._klines = {}
+
+    @property
+    def price(self):
+        """现价：最后收盘价附近缓慢波动，页面实时模式能看到变化"""
+        return round(float(self.daily["收盘"].iloc[-1]) * (1 + 0.003 * math.sin(time.time() / 30)), 3)
+
+    def klines(self, period):
+        """push2his 格式的K线行 (日期升序)；周线/月线以该周期最后一个交易日为日期"""
+        if period not in self._klines:
+            df = self.daily
+            if period != "daily":
+                key = df["日期"].dt.to_period("W-FRI" if period == "weekly" else "M")
+                df = df.groupby(key).agg({
+                    "日期": "last", "开盘": "first", "收盘": "last", "最高": "max", "最低": "min",
+                    "成交量": "sum", "成交额": "sum", "换手率": "sum",
+                }).reset_index(drop=True)
+            prev = df["收盘"].shift(1).fillna(df["开盘"])
+            df = df.assign(
+                日期=df["日期"].dt.strftime("%Y-%m-%d"),
+                振幅=((df["最高"] - df["最低"]) / prev * 100).round(2),
+                涨跌幅=((df["收盘"] / prev - 1) * 100).round(2),
+                涨跌额=(df["收盘"] - prev).round(3),
+            )[KLINE_FIELDS]
+            self._klines[period] = [",".join(str(v) for v in row) for row in df.itertuples(index=False, name=None)]
+        return self._klines[period]
+
+
+class RecordedData:
+    """录制的上游响应 (fundgz 估值、push2 现价、push2his 周线、pingzhongdata 净值)，接口与 MarketData 相同
+
+    fundgz 原样回放；录制数据只有周线，set_weeks 只保留最近 weeks 周的K线及同一时间段内的净值。
+    """
+
+    def __init__(self, code, fundgz, push2, push2his, pingzhongdata):
+        self.code = code
+        self.fundgz = fundgz
+        self.price = json.loads(push2)["data"]["f43"]
+        self._klines = json.loads(push2his)["data"]["klines"]
+        trend = json.loads(re.search(r'Data_netWorthTrend\s*=\s*(\[.*?\]);', pingzhongdata, re.S).group(1))
+        dates = pd.to_datetime([item["x"] for item in trend], unit="ms", utc=True).tz_convert("Asia/Shanghai")
+        self._nav = pd.DataFrame({"净值日期": dates.strftime("%Y-%m-%d"), "单位净值": [item["y"] for item in trend]})
+        self.set_weeks(None)
+
+    def set_weeks(self, weeks):
+        """只回放最近 weeks 周 (None 表示全部)"""
+        self.weekly = self._klines[-weeks:] if weeks else self._klines
+        self.nav = self._nav[self._nav["净值日期"] >= self.weekly[0][:10]].reset_index(drop=True)
+
+    def klines(self, period):
+        return self.weekly if period == "weekly" else []
+
+
+PERIODS = {"101": "daily", "102": "weekly", "103": "monthly"}
+
+
+class MockUpstream:
+    """按主机与路径分发请求，返回 (状态码, Content-Type, 响应体)
+
+    source(code) 返回一只基金的数据 (默认按代码生成 MarketData)；failing 中的主机返回 404。
+    """
+
+    def __init__(self, faults=None, years=DEFAULT_YEARS, source=None):
+        self.faults = faults or FaultConfig()
+        self.years = years
+        self.source = source or (lambda code: MarketData(code, years))
+        self.failing = set()
+        self.stats = {}
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def data(self, code):
+        with self._lock:
+            if code not in self._data:
+                self._data[code] = self.source(code)
+            return self._data[code]
+
+    def count(self, host, status):
+        with self._lock:
+            by_status = self.stats.setdefault(host, {})
+            by_status[status] = by_status.get(status, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {host: dict(by_status) for host, by_status in self.stats.items()}
+
+    # === 各接口 ===
+
+    def fundgz(self, code):
+        data = self.data(code)
+        if isinstance(data, RecordedData):
+            return data.fundgz, "application/javascript"
+        nav = data.nav.iloc[-1]
+        body = json.dumps({
+            "fundcode": code, "name": f"模拟{code}", "jzrq": nav["净值日期"], "dwjz": f"{nav['单位净值']:.4f}",
+            "gsz": f"{data.price * 0.996:.4f}", "gszzl": "0.35", "gztime": time.strftime("%Y-%m-%d %H:%M"),
+        }, ensure_ascii=False)
+        return f"jsonpgz({body});", "application/javascript"
+
+    def push2_quote(self, params):
+        code = params.get("secid", "0.159941").split(".")[-1]
+        return json.dumps({"rc": 0, "data": {"f43": self.data(code).price, "f57": code, "f58": f"模拟{code}"}}, ensure_ascii=False), "application/json"
+
+    def push2_ulist(self, params):
+        codes = [secid.split(".")[-1] for secid in params.get("secids", "").split(",") if secid]
+        diff = [{"f12": code, "f43": self.data(code).price} for code in codes]
+        return json.dumps({"rc": 0, "data": {"total": len(diff), "diff": diff}}), "application/json"
+
+    def push2his_kline(self, params):
+        code = params.get("secid", "0.159941").split(".")[-1]
+        beg = params.get("beg", "19700101")
+        beg = f"{beg[:4]}-{beg[4:6]}-{beg[6:8]}"
+        klines = [line for line in self.data(code).klines(PERIODS.get(params.get("klt"), "daily")) if line[:10] >= beg]
+        return json.dumps({"rc": 0, "data": {"code": code, "klines": klines}}, ensure_ascii=False), "application/json"
+
+    def pingzhongdata(self, code):
+        nav = self.data(code).nav
+        # x 为北京时间零点的毫秒时间戳
+        stamps = pd.DatetimeIndex(nav["净值日期"]).tz_localize("Asia/Shanghai").as_unit("ms").asi8
+        trend = [{"x": int(x), "y": float(y), "equityReturn": 0, "unitMoney": ""} for x, y in zip(stamps, nav["单位净值"])]
+        return f'var fS_code = "{code}";var Data_netWorthTrend = {json.dumps(trend, separators=(",", ":"))};var Data_ACWorthTrend = [];', "application/javascript"
+
+    def lsjz(self, params):
+        nav = self.data(params.get("fundCode", "159941")).nav
+        rows = nav[nav["净值日期"] >= params.get("startDate", "")].iloc[::-1]
+        size = int(params.get("pageSize", 20))
+        page = rows.iloc[(int(params.get("pageIndex", 1)) - 1) * size:][:size]
+        items = [{"FSRQ": d, "DWJZ": f"{v:.4f}"} for d, v in zip(page["净值日期"], page["单位净值"])]
+        return json.dumps({"Data": {"LSJZList": items}, "ErrCode": 0, "TotalCount": len(rows)}), "application/json"
+
+    def sina(self, symbol):
+        price = self.data(symbol[2:]).price
+        return f'var hq_str_{symbol}="模拟,{price},{price},{price},{price},{price}";'.encode("gbk"), "application/javascript"
+
+    def tencent(self, symbol):
+        price = self.data(symbol[2:]).price
+        return f'v_{symbol}="1~模拟~{symbol[2:]}~{price}~{price}~{price}";'.encode("gbk"), "application/javascript"
+
+    def route(self, host, path, params):
+        """返回 (Content-Type, 响应体)，未知接口返回 None"""
+        if host == "fundgz.1234567.com.cn" and path.startswith("/js/"):
+            return self.fundgz(path[len("/js/"):].split(".")[0])
+        if host == "push2.eastmoney.com" and path == "/api/qt/stock/get":
+            return self.push2_quote(params)
+        if host == "push2.eastmoney.com" and path == "/api/qt/ulist.np/get":
+            return self.push2_ulist(params)
+        if host == "push2his.eastmoney.com" and path == "/api/qt/stock/kline/get":
+            return self.push2his_kline(params)
+        if host == "fund.eastmoney.com" and path.startswith("/pingzhongdata/"):
+            return self.pingzhongdata(path[len("/pingzhongdata/"):].split(".")[0])
+        if host == "api.fund.eastmoney.com" and path == "/f10/lsjz":
+            return self.lsjz(params)
+        if host == "hq.sinajs.cn" and path.startswith("/list="):
+            return self.sina(path[len("/list="):])
+        if host == "qt.gtimg.cn" and path.startswith("/q="):
+            return self.tencent(path[len("/q="):])
+        return None
+
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _send(self, status, body, content_type="application/json"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        mock = self.server.mock
+        parts = urlsplit(self.path)
+        if parts.path == "/_stats":
+            return self._send(200, json.dumps(mock.snapshot()))
+        if parts.path == "/_config":
+            return self._send(200, json.dumps(mock.faults.to_dict()))
+        host, _, path = parts.path.lstrip("/").partition("/")
+        path = "/" + path
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+
+        time.sleep(mock.faults.delay())
+        status = 404 if host in mock.failing else mock.faults.status()
+        if status is None and host == "push2.eastmoney.com" and path == "/api/qt/stock/sse":
+            mock.count(host, 200)
+            return self._stream(mock, params)
+        result = mock.route(host, path, params) if status is None else None
+        if status is None and result is None:
+            status = 404
+        mock.count(host, status or 200)
+        if status is not None:
+            return self._send(status, f"mock upstream: {status}", "text/plain")
+        body, content_type = result
+        self._send(200, body, content_type)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/_config":
+            return self._send(404, "not found", "text/plain")
+        length = int(self.headers.get("Content-Length") or 0)
+        self.server.mock.faults.update(json.loads(self.rfile.read(length) or b"{}"))
+        self._send(200, json.dumps(self.server.mock.faults.to_dict()))
+
+    def _stream(self, mock, params):
+        """SSE 推送：每隔 SSE_INTERVAL 秒推送一次现价，直到客户端断开"""
+        code = params.get("secid", "0.159941").split(".")[-1]
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            while True:
+                message = json.dumps({"data": {"f43": mock.data(code).price}})
+                self.wfile.write(f"data: {message}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(SSE_INTERVAL)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024   # 默认 5，数百个并发连接时会排队等待重传 SYN
+
+
+def start_mock_upstream(port=0, host="127.0.0.1", faults=None, years=DEFAULT_YEARS, source=None):
+    """在后台线程启动模拟服务器 (port=0 时随机端口)，返回 server；server.mock 为 MockUpstream，
+    地址为 f"http://{host}:{server.server_address[1]}"，停止时调用 server.shutdown()"""
+    server = MockUpstreamServer((host, port), MockUpstreamHandler)
+    server.mock = MockUpstream(faults, years, source)
+    threading.Thread(target=server.serve_forever, name="mock-upstream", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地模拟行情服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口 (默认 {DEFAULT_PORT})")
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS, help=f"生成多少年的历史 (默认 {DEFAULT_YEARS})")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的延迟 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机浮动范围 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 500 的概率 (0~1)")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="每隔多少秒出现一次 503 突发 (0 表示不启用)")
+    parser.add_argument("--burst-length", type=float, default=0.0, help="每次 503 突发持续的秒数")
+    args = parser.parse_args(argv)
+
+    faults = FaultConfig(args.latency, args.jitter, args.error_rate, args.burst_every, args.burst_length)
+    server = start_mock_upstream(args.port, args.host, faults, args.years)
+    url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"模拟行情服务器已启动: {url}  (故障注入 {faults.to_dict()})")
+    print(f"对接方式: ETF_UPSTREAM_URL={url} streamlit run app.py")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""网络请求增强模块
+
+- get_robust_session：带自动重试与按主机熔断的同步 requests Session
+- AsyncHTTPClient：共用同一重试/熔断策略的 asyncio 客户端 (httpx 连接池)，
+  在一个后台事件循环里处理所有会话的请求，不再每个在途请求占用一个线程
+- 上游地址覆盖：设置 ETF_UPSTREAM_URL (如 http://127.0.0.1:8900) 后，所有上游请求改发到
+  <地址>/<原主机名>/<原路径>，用于对接本地模拟服务器 (mock_upstream.py) 压测；
+  熔断、重试与耗时记录仍按原主机统计
+"""
+import asyncio
+import os
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+from breaker import CircuitBreakerAdapter, get_breaker
+from timing import detached_span, span
+
+# 重试策略：总共重试3次，退避系数1(即间隔1s, 2s, 4s再试)，针对常见的500/502/503错误和连接错误
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 1
+RETRY_STATUS = [500, 502, 503, 504]
+
+# 通用浏览器头
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "*/*",
+    "Connection": "keep-alive"
+}
+
+ASYNC_MAX_CONNECTIONS = 20   # 异步连接池上限
+
+UPSTREAM_ENV = "ETF_UPSTREAM_URL"
+_upstream_base = os.environ.get(UPSTREAM_ENV, "").rstrip("/")
+
+
+def set_upstream_base(base_url):
+    """运行时设置上游地址覆盖，None 或空字符串恢复直连"""
+    global _upstream_base
+    _upstream_base = (base_url or "").rstrip("/")
+
+
+def upstream_override():
+    """当前的上游地址覆盖，未设置时为空字符串"""
+    return _upstream_base
+
+
+def resolve_url(url):
+    """按上游地址覆盖改写请求地址：https://主机/路径?参数 -> <覆盖地址>/主机/路径?参数"""
+    if not _upstream_base:
+        return url
+    parts = urlsplit(url)
+    return f"{_upstream_base}/{parts.hostname}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+class InstrumentedSession(requests.Session):
+    """为每个请求记录耗时 span：主机、路径、响应字节数与实际重试次数"""
+
+    def request(self, method, url, *args, **kwargs):
+        parts = urlsplit(url)
+        with span(f"http {parts.hostname}", method=method, path=parts.path) as s:
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except requests.RequestException as e:
+                # 重试耗尽时没有响应可读重试次数 (MaxRetryError 包在 RetryError / ConnectionError 中)，按重试上限计
+                if e.args and isinstance(e.args[0], MaxRetryError):
+                    s.retries = self.get_adapter(url).max_retries.total
+                raise
+            retries = getattr(response.raw, "retries", None)
+            s.retries = len(retries.history) if retries is not None else 0
+            if not kwargs.get("stream"):
+                s.bytes = len(response.content)
+            if response.status_code >= 400:
+                s.outcome = "error"
+                s.error = f"HTTP {response.status_code}"
+            return response
+
+
+def get_robust_session():
+    """创建一个带有自动重试功能的 Session"""
+    session = InstrumentedSession()
+    retries = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=["GET"]
+    )
+    # 将重试策略挂载到 http 和 https，外层按主机熔断，上游故障时快速失败
+    adapter = CircuitBreakerAdapter(max_retries=retries, resolve=resolve_url)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(BROWSER_HEADERS)
+    return session
+
+
+class AsyncHTTPClient:
+    """后台线程中常驻的事件循环 + httpx.AsyncClient 连接池"""
+
+    def __init__(self, max_connections=ASYNC_MAX_CONNECTIONS):
+        self._max_connections = max_connections
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-http", daemon=True)
+        self._thread.start()
+
+    def _get_client(self):
+        # 只在事件循环线程内创建与使用
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=BROWSER_HEADERS,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                ),
+            )
+        return self._client
+
+    async def get(self, url, params=None, headers=None, timeout=15):
+        """GET 请求：按 RETRY_* 策略重试，整个重试过程计为熔断器的一次成功或失败"""
+        parts = urlsplit(url)
+        breaker = get_breaker(parts.hostname)
+        # 事件循环线程里并发执行多个请求，span 不做线程内嵌套
+        with detached_span(f"http {parts.hostname}", method="GET", path=parts.path) as s:
+            breaker.before_request()
+            client = self._get_client()
+            try:
+                for attempt in range(RETRY_TOTAL + 1):
+                    s.retries = attempt
+                    if attempt:
+                        await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+                    try:
+                        response = await client.get(resolve_url(url), params=params, headers=headers, timeout=timeout)
+                    except httpx.TransportError:
+                        if attempt == RETRY_TOTAL:
+                            raise
+                        continue
+                    if response.status_code not in RETRY_STATUS or attempt == RETRY_TOTAL:
+                        break
+            except asyncio.CancelledError:
+                # 对冲请求被取消时没有结果，必须释放探测名额，否则半开状态会一直拒绝请求
+                breaker.abandon()
+                raise
+            except Exception:
+                breaker.record_failure()
+                raise
+            s.bytes = len(response.content)
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code >= 400:
+                s.outcome = "error"
+                s.error = f"HTTP {response.status_code}"
+            return response
+
+    async def gather(self, coros):
+        """并发执行多个协程，单个失败以异常对象返回，不影响其它请求"""
+        return await asyncio.gather(*coros, return_exceptions=True)
+
+    def run(self, coro, timeout=None):
+        """从任意同步线程提交协程到事件循环并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+
+_async_client = None
+_async_lock = threading.Lock()
+
+
+def get_async_client():
+    """进程级共享的异步客户端 (首次使用时启动事件循环线程)"""
+    global _async_client
+    with _async_lock:
+        if _async_client is None:
+            _async_client = AsyncHTTPClient()
+        return _async_client
@@ -0,0 +1,127 @@
+"""后台行情刷新线程
+
+每个服务进程只启动一个刷新线程，按各数据源缓存的有效期并发拉取，
+提前让缓存保持新鲜，所有浏览器会话只读内存中的缓存，不再各自访问上游。
+"""
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+# 数据源失败后的重试间隔 (秒)，不必等满整个刷新周期
+RETRY_DELAY = 15
+
+
+def fetch_concurrently(pool, calls, deadline):
+    """在线程池中同时发起 calls ({名称: 无参函数})，每个调用最多等待 deadline 秒
+
+    返回 {名称: 结果}，超时或抛出异常的调用对应值为 None。
+    """
+    futures = {name: pool.submit(func) for name, func in calls.items()}
+    end = time.monotonic() + deadline
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(0.0, end - time.monotonic()))
+        except FutureTimeoutError:
+            # 超过截止时间的数据源直接放弃，不再拖慢整体刷新
+            future.cancel()
+            print(f"Fetch Timeout: {name} > {deadline}s")
+            results[name] = None
+        except Exception as e:
+            print(f"Fetch Error ({name}): {e}")
+            results[name] = None
+    return results
+
+
+class MarketDataPoller:
+    """按计划刷新一组 swr_cache 缓存函数，让会话读取时缓存始终是热的
+
+    sources: {名称: (swr_cache 缓存函数, 默认值)}，缓存函数以基金代码为唯一参数，
+    刷新间隔取各函数的 ttl。
+    """
+
+    def __init__(self, code, sources, pool, deadline):
+        self.code = code
+        self._sources = sources
+        self._pool = pool
+        self._deadline = deadline
+        self._next_run = {name: 0.0 for name in sources}
+        # 实时模式的加速刷新：{名称: (刷新间隔, 租约到期时间)}
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"poller-{code}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wait_ready(self, timeout=None):
+        """等待首轮刷新完成 (仅在进程刚启动时可能需要等待)"""
+        return self._ready.wait(timeout)
+
+    def entries(self):
+        """返回各数据源的缓存记录 (含取得时间与是否过期)，从未成功时为 None"""
+        return {name: func.get_entry(self.code) for name, (func, _) in self._sources.items()}
+
+    def snapshot(self):
+        """返回所有数据源的最新结果 (内存读取，不访问网络)"""
+        return {
+            name: entry.value if entry is not None else self._sources[name][1]
+            for name, entry in self.entries().items()
+        }
+
+    def keep_fresh(self, names, interval, lease):
+        """在接下来 lease 秒内把指定数据源的刷新间隔缩短为 interval
+
+        实时模式的会话每次刷新时续约；没有会话续约后自动恢复按 ttl 刷新，
+        无论多少会话同时开启实时模式，上游请求频率都只取决于 interval。
+        """
+        now = time.monotonic()
+        with self._lock:
+            for name in names:
+                self._leases[name] = (interval, now + lease)
+                self._next_run[name] = min(self._next_run[name], now + interval)
+        self._wake.set()
+
+    def _interval(self, name, now):
+        interval, until = self._leases.get(name, (None, 0.0))
+        return interval if until > now else self._sources[name][0].ttl
+
+    def refresh(self, names):
+        """立即并发刷新指定数据源；失败时缓存保留上一次的有效结果"""
+        calls = {name: (lambda func=self._sources[name][0]: func.refresh(self.code)) for name in names}
+        before = {name: self._sources[name][0].peek(self.code) for name in names}
+        results = fetch_concurrently(self._pool, calls, self._deadline)
+        now = time.monotonic()
+        with self._lock:
+            for name, entry in results.items():
+                interval = self._interval(name, now)
+                if entry is not None and entry is not before[name]:
+                    self._next_run[name] = now + interval
+                else:
+                    # 本轮没有拿到新数据，提前重试
+                    self._next_run[name] = now + min(interval, RETRY_DELAY)
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                due = [name for name, t in self._next_run.items() if t <= now]
+            if due:
+                try:
+                    self.refresh(due)
+                except Exception as e:
+                    print(f"Poller Error: {e}")
+            self._ready.set()
+            with self._lock:
+                wait = min(self._next_run.values()) - time.monotonic()
+            # keep_fresh 缩短间隔时提前唤醒
+            self._wake.wait(max(1.0, wait))
+            self._wake.clear()
@@ -0,0 +1,238 @@
+"""场内现价的多数据源故障转移链
+
+按优先级注册多个报价源 (东财 push2 / 东财 ulist / 新浪 / 腾讯 / akshare 现货)，
+记录每个源的延迟与成功率；每次取价先请求当前最快且健康的源，
+若超过对冲延迟仍未返回则并行请求下一个源，任一源成功即返回，
+刷新延迟由最好的源决定，而不是最慢的源。
+akshare 现货下载全市场快照且无法取消，不参与对冲，只在其余源全部失败后才使用。
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from breaker import CLOSED, get_breaker
+from net import upstream_override
+
+HEDGE_DELAY = 1.0        # 首选源超过该时间 (秒) 未返回时，并行请求下一个源
+PROVIDER_TIMEOUT = 20    # 单个源的请求超时 (秒)
+HEALTHY_RATE = 0.5       # 成功率低于该值视为不健康，排到队尾
+EWMA_ALPHA = 0.3         # 延迟指数平滑系数
+RATE_WINDOW = 20         # 成功率按最近多少次请求计算，失败过的源恢复后可重新排到前面
+
+
+def get_secid(code):
+    """东财行情 secid：沪市 (5/6 开头) 为 1，深市为 0"""
+    return f"1.{code}" if code.startswith(("5", "6")) else f"0.{code}"
+
+
+def get_market_symbol(code):
+    """新浪/腾讯行情代码：sh159941 / sz159941"""
+    return f"sh{code}" if code.startswith(("5", "6")) else f"sz{code}"
+
+
+def _to_price(value):
+    price = float(value)
+    if price <= 0:
+        raise ValueError(f"无效价格: {value}")
+    return price
+
+
+class QuoteProvider:
+    """报价源基类：子类实现 fetch(client, code)，失败时抛出异常"""
+
+    name = ""
+    host = ""
+    fallback_only = False   # 为 True 时不参与对冲，只在其余源全部失败后才请求
+
+    def __init__(self):
+        self.latency = None
+        self.successes = 0
+        self.failures = 0
+        self._recent = deque(maxlen=RATE_WINDOW)
+
+    @property
+    def success_rate(self):
+        return sum(self._recent) / len(self._recent) if self._recent else 1.0
+
+    @property
+    def healthy(self):
+        # 熔断或半开探测中的主机请求会快速失败，排到健康源之后
+        if self.host and get_breaker(self.host).state != CLOSED:
+            return False
+        return self.success_rate >= HEALTHY_RATE
+
+    def record(self, ok, elapsed=None):
+        self._recent.append(ok)
+        if ok:
+            self.successes += 1
+            self.latency = elapsed if self.latency is None else (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * elapsed
+        else:
+            self.failures += 1
+
+    async def fetch(self, client, code):
+        raise NotImplementedError
+
+
+class Push2Provider(QuoteProvider):
+    name = "东财push2"
+    host = "push2.eastmoney.com"
+
+    async def fetch(self, client, code):
+        url = "https://push2.eastmoney.com/api/qt/stock/get"
+        params = {"invt": "2", "fltt": "2", "secid": get_secid(code), "fields": "f43"}
+        r = await client.get(url, params=params, timeout=PROVIDER_TIMEOUT)
+        return _to_price((r.json().get("data") or {}).get("f43", "-"))
+
+
+class Push2UlistProvider(QuoteProvider):
+    name = "东财ulist"
+    host = "push2.eastmoney.com"
+
+    async def fetch(self, client, code):
+        url = "https://push2.eastmoney.com/api/qt/ulist.np/get"
+        params = {"invt": "2", "fltt": "2", "secids": get_secid(code), "fields": "f12,f43"}
+        r = await client.get(url, params=params, timeout=PROVIDER_TIMEOUT)
+        diff = (r.json().get("data") or {}).get("diff") or []
+        if isinstance(diff, dict):
+            diff = list(diff.values())
+        return _to_price(diff[0].get("f43", "-"))
+
+
+class SinaProvider(QuoteProvider):
+    name = "新浪"
+    host = "hq.sinajs.cn"
+
+    async def fetch(self, client, code):
+        url = f"https://hq.sinajs.cn/list={get_market_symbol(code)}"
+        r = await client.get(url, headers={"Referer": "https://finance.sina.com.cn"}, timeout=PROVIDER_TIMEOUT)
+        # var hq_str_sz159941="名称,今开,昨收,现价,..."
+        fields = r.content.decode("gbk", errors="ignore").split('"')[1].split(",")
+        return _to_price(fields[3])
+
+
+class TencentProvider(QuoteProvider):
+    name = "腾讯"
+    host = "qt.gtimg.cn"
+
+    async def fetch(self, client, code):
+        url = f"https://qt.gtimg.cn/q={get_market_symbol(code)}"
+        r = await client.get(url, timeout=PROVIDER_TIMEOUT)
+        # v_sz159941="1~名称~159941~现价~昨收~..."
+        fields = r.content.decode("gbk", errors="ignore").split('"')[1].split("~")
+        return _to_price(fields[3])
+
+
+class AkshareSpotProvider(QuoteProvider):
+    name = "akshare现货"
+    host = "akshare"
+    fallback_only = True
+
+    async def fetch(self, client, code):
+        if upstream_override():
+            raise RuntimeError("已设置上游地址覆盖，不使用 akshare 现货")
+
+        def spot():
+            import akshare as ak
+            df = get_breaker(self.host).call(ak.fund_etf_spot_em)
+            return df.loc[df["代码"] == code, "最新价"].iloc[0]
+        # akshare 为同步接口且下载全市场快照，放到线程中执行，仅作为最后的兜底
+        return _to_price(await asyncio.to_thread(spot))
+
+
+class QuoteChain:
+    """按健康度与延迟排序的报价源链，带对冲请求"""
+
+    def __init__(self, providers, hedge_delay=HEDGE_DELAY):
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self._lock = threading.Lock()
+
+    def ordered(self):
+        """健康的源在前，同为健康时延迟低的在前；未测过延迟的按注册顺序排在已测源之后"""
+        with self._lock:
+            return sorted(
+                self.providers,
+                key=lambda p: (not p.healthy, p.latency is None, p.latency or 0.0),
+            )
+
+    async def fetch(self, client, code):
+        """返回 (现价, 报价源名称)；所有源都失败时抛出最后一个异常"""
+        pending = {}
+        ordered = self.ordered()
+        queue = [p for p in ordered if not p.fallback_only]
+        fallbacks = [p for p in ordered if p.fallback_only]
+        hedging = True
+        last_error = None
+
+        def launch():
+            provider = queue.pop(0)
+            task = asyncio.ensure_future(provider.fetch(client, code))
+            pending[task] = (provider, time.monotonic())
+
+        launch()
+        try:
+            while pending:
+                timeout = self.hedge_delay if queue and hedging else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 当前源迟迟不返回，对冲请求下一个源
+                    launch()
+                    continue
+                for task in done:
+                    provider, started = pending.pop(task)
+                    elapsed = time.monotonic() - started
+                    try:
+                        price = task.result()
+                    except Exception as e:
+                        with self._lock:
+                            provider.record(False)
+                        last_error = e
+                        if not queue and not pending and fallbacks:
+                            # 对冲的源全部失败，逐个请求兜底源
+                            queue, fallbacks, hedging = fallbacks, [], False
+                        if queue and (hedging or not pending):
+                            launch()
+                        continue
+                    with self._lock:
+                        provider.record(True, elapsed)
+                    return price, provider.name
+        finally:
+            # 已有结果或全部失败后取消仍在途的请求 (不计入失败)
+            for task in pending:
+                task.cancel()
+        raise last_error or RuntimeError("没有可用的报价源")
+
+    def stats(self):
+        """各报价源的健康状况，供界面展示"""
+        with self._lock:
+            return [
+                {
+                    "报价源": p.name,
+                    "平均延迟(ms)": round(p.latency * 1000) if p.latency is not None else None,
+                    f"近{RATE_WINDOW}次成功率": round(p.success_rate * 100, 1),
+                    "成功": p.successes,
+                    "失败": p.failures,
+                    "健康": p.healthy,
+                }
+                for p in self.providers
+            ]
+
+
+_chain = None
+_chain_lock = threading.Lock()
+
+
+def get_quote_chain():
+    """进程级共享的报价源链 (统计数据在所有会话间共享)"""
+    global _chain
+    with _chain_lock:
+        if _chain is None:
+            _chain = QuoteChain([
+                Push2Provider(),
+                Push2UlistProvider(),
+                SinaProvider(),
+                TencentProvider(),
+                AkshareSpotProvider(),
+            ])
+        return _chain
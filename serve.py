@@ -0,0 +1,37 @@
+"""带 Prometheus 指标接口的启动入口
+
+先在本进程启动 /metrics (metrics.start_metrics_server)，再在同一进程中启动 Streamlit 服务，
+指标接口随服务启动即可抓取，不必等浏览器打开页面；页面内的 get_metrics_server() 拿到的是同一个 server。
+其余参数原样传给 streamlit run：
+
+    python serve.py --metrics-port 9108 --server.port 8501 --server.headless true
+    curl http://127.0.0.1:9108/metrics
+"""
+import argparse
+import os
+import sys
+
+from streamlit.web import cli as streamlit_cli
+
+from metrics import METRICS_PORT_ENV, start_metrics_server
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="启动 Streamlit 页面与 Prometheus 指标接口")
+    parser.add_argument("--metrics-port", type=int, default=os.environ.get(METRICS_PORT_ENV),
+                        help=f"指标接口端口 (默认读取 {METRICS_PORT_ENV})")
+    args, streamlit_args = parser.parse_known_args(argv)
+    if args.metrics_port is None:
+        parser.error(f"需要指定 --metrics-port 或设置 {METRICS_PORT_ENV}")
+
+    # 页面脚本读取同一个环境变量，get_metrics_server() 直接返回已启动的 server
+    os.environ[METRICS_PORT_ENV] = str(args.metrics_port)
+    server = start_metrics_server(args.metrics_port)
+    print(f"指标接口已启动: http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    sys.exit(streamlit_cli.main(["run", APP_PATH, *streamlit_args], prog_name="streamlit"))
+
+
+if __name__ == "__main__":
+    main()
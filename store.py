@@ -0,0 +1,139 @@
+"""本地历史数据仓库 (SQLite)
+
+按基金代码持久化 K 线与历史净值，进程重启后无需重新下载全量历史，
+刷新时只需拉取并追加最后一条记录之后的新数据。
+"""
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import pandas as pd
+
+# 数据目录可通过环境变量覆盖，默认放在项目目录下的 .data
+DATA_DIR = os.environ.get("ETF_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data"))
+DB_PATH = os.path.join(DATA_DIR, "history.db")
+
+# akshare K线列名 -> 数据库列名
+KLINE_COLUMNS = {
+    "日期": "date",
+    "开盘": "open",
+    "收盘": "close",
+    "最高": "high",
+    "最低": "low",
+    "成交量": "volume",
+    "成交额": "amount",
+    "振幅": "amplitude",
+    "涨跌幅": "pct_change",
+    "涨跌额": "change",
+    "换手率": "turnover",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kline (
+    code TEXT NOT NULL,
+    period TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL, close REAL, high REAL, low REAL,
+    volume REAL, amount REAL, amplitude REAL,
+    pct_change REAL, change REAL, turnover REAL,
+    PRIMARY KEY (code, period, date)
+);
+CREATE TABLE IF NOT EXISTS nav (
+    code TEXT NOT NULL,
+    date TEXT NOT NULL,
+    nav REAL NOT NULL,
+    PRIMARY KEY (code, date)
+);
+"""
+
+_write_lock = threading.Lock()
+_initialized = False
+
+
+def _connect():
+    global _initialized
+    if not _initialized:
+        os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    if not _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized = True
+    return conn
+
+
+def _to_date_str(series):
+    return pd.to_datetime(series.astype(str), errors="coerce").dt.strftime("%Y-%m-%d")
+
+
+# === K线 ===
+
+def last_kline_date(code, period="weekly"):
+    """返回库中该代码最后一根K线的日期 (YYYY-MM-DD)，没有数据时返回 None"""
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT MAX(date) FROM kline WHERE code = ? AND period = ?", (code, period)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def upsert_kline(code, period, df, replace_from=None):
+    """写入K线；replace_from 之后 (含) 的旧记录先删除，以覆盖尚未走完的周期"""
+    if df.empty:
+        return
+    data = df.loc[:, [c for c in KLINE_COLUMNS if c in df.columns]].rename(columns=KLINE_COLUMNS)
+    data["date"] = _to_date_str(data["date"])
+    data = data.dropna(subset=["date"])
+    cols = list(data.columns)
+    sql = f"INSERT OR REPLACE INTO kline (code, period, {', '.join(cols)}) VALUES (?, ?, {', '.join('?' * len(cols))})"
+    records = [(code, period, *row) for row in data.itertuples(index=False, name=None)]
+    with _write_lock, closing(_connect()) as conn, conn:
+        if replace_from:
+            conn.execute(
+                "DELETE FROM kline WHERE code = ? AND period = ? AND date >= ?", (code, period, replace_from)
+            )
+        conn.executemany(sql, records)
+
+
+def load_kline(code, period="weekly"):
+    """读取该代码的全部K线 (按日期升序，列名与 akshare 一致)"""
+    with closing(_connect()) as conn:
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(KLINE_COLUMNS.values())} FROM kline WHERE code = ? AND period = ? ORDER BY date",
+            conn,
+            params=(code, period),
+        )
+    return df.rename(columns={v: k for k, v in KLINE_COLUMNS.items()})
+
+
+# === 历史净值 ===
+
+def last_nav_date(code):
+    """返回库中该代码最后一条净值的日期 (YYYY-MM-DD)，没有数据时返回 None"""
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT MAX(date) FROM nav WHERE code = ?", (code,)).fetchone()
+    return row[0] if row else None
+
+
+def upsert_nav(code, df):
+    """写入净值 (列: 净值日期, 单位净值)，同一日期的记录以新数据为准"""
+    if df.empty:
+        return
+    dates = _to_date_str(df["净值日期"])
+    navs = pd.to_numeric(df["单位净值"], errors="coerce")
+    valid = dates.notna() & navs.notna()
+    records = [(code, d, float(v)) for d, v in zip(dates[valid], navs[valid])]
+    with _write_lock, closing(_connect()) as conn, conn:
+        conn.executemany("INSERT OR REPLACE INTO nav (code, date, nav) VALUES (?, ?, ?)", records)
+
+
+def load_nav(code):
+    """读取该代码的全部净值 (按日期升序)"""
+    with closing(_connect()) as conn:
+        df = pd.read_sql_query(
+            "SELECT date AS 净值日期, nav AS 单位净值 FROM nav WHERE code = ? ORDER BY date",
+            conn,
+            params=(code,),
+        )
+    return df
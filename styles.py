@@ -0,0 +1,31 @@
+"""分析/自选报表的渲染样式
+
+页面 (app.py 的 render_report) 与渲染基准 (benchmarks/bench_render.py) 共用：
+判定列转为原生分类标记，小表另外用 pandas Styler 按行着色。
+"""
+import numpy as np
+import pandas as pd
+
+COLOR_BUY_BG = "#6B8E23"    # 橄榄绿
+COLOR_BUY_TEXT = "#FFFFFF"  # 白
+COLOR_RT_BG = "#D6DCE5"     # 淡蓝灰
+CSS_BUY = f"background-color: {COLOR_BUY_BG}; color: {COLOR_BUY_TEXT}; font-weight: bold; "
+CSS_RT = f"background-color: {COLOR_RT_BG}; font-weight: bold; "
+
+# 超过该行数的表格不再用 pandas Styler 着色 (Styler 逐单元格生成样式与显示值，
+# 渲染开销随行数线性增长)，只靠判定列的原生标记区分
+STYLE_MAX_ROWS = 60
+SIGNAL_BUY = "🟢 符合条件"
+SIGNAL_WAIT = "不符合"
+
+
+def row_styles(df):
+    """按 is_buy / type 一次性算出每行的样式，整表广播 (Styler.apply axis=None，不再逐行回调)"""
+    css = np.where(df["is_buy"], CSS_BUY, np.where(df["type"] == "realtime", CSS_RT, ""))
+    return pd.DataFrame(np.repeat(css[:, None], df.shape[1], axis=1), index=df.index, columns=df.columns)
+
+
+def style_report(df):
+    """返回交给 st.dataframe 的数据：不超过 STYLE_MAX_ROWS 行时为按行着色的 Styler，否则为 DataFrame"""
+    df = df.assign(判定=pd.Categorical(np.where(df["is_buy"], SIGNAL_BUY, SIGNAL_WAIT), categories=[SIGNAL_BUY, SIGNAL_WAIT]))
+    return df.style.apply(row_styles, axis=None) if len(df) <= STYLE_MAX_ROWS else df
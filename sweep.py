@@ -0,0 +1,143 @@
+"""规则阈值的参数扫描 (网格搜索)
+
+在 (溢价阈值, 均线窗口, 止损线, 周线/日线) 网格上批量回测并排名。
+价格与溢价数组放入共享内存，各工作进程直接映射同一块内存 (零拷贝)，
+任务只传递参数分块；每个进程内部再用 backtest.run_backtest 对整块参数向量化计算。
+进程池运行在独立的 python -m sweep 子进程中，工作进程不会加载调用方的 __main__ (如 Streamlit 页面)。
+"""
+import itertools
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import run_backtest
+
+CHUNK_SIZE = 2000   # 每个任务包含的参数组合数
+
+# 默认扫描网格 (当前规则为 溢价 1%、20 周均线、止损 -8%)
+DEFAULT_PREMIUMS = [0.5, 1.0, 1.5, 2.0, 3.0]
+DEFAULT_WINDOWS = [5, 10, 15, 20, 30, 40, 60]
+DEFAULT_LOSS_CUTS = [-5.0, -8.0, -10.0, -15.0, -20.0]
+
+PERIOD_LABELS = {"weekly": "周线", "daily": "日线"}
+
+# 工作进程内已映射的共享数组：{周期: (close, premium)}
+_worker_arrays = {}
+_worker_shms = []
+
+
+def _init_worker(specs):
+    """工作进程启动时映射共享内存 (每个进程只映射一次)"""
+    for period, (name, length) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        block = np.ndarray((2, length), dtype=np.float64, buffer=shm.buf)
+        _worker_arrays[period] = (block[0], block[1])
+        _worker_shms.append(shm)
+
+
+def _run_chunk(period, premium_threshold, ma_window, loss_cut, qty):
+    close, premium = _worker_arrays[period]
+    r = run_backtest(close, premium, premium_threshold, ma_window, loss_cut, qty=qty)
+    return {key: r[key] for key in ("trades", "hit_rate", "total_return_pct", "pnl", "max_drawdown", "exposure")}
+
+
+def _run_pool(arrays, tasks, qty, workers):
+    """把各周期的数组放入共享内存，在进程池中执行全部参数分块，返回与 tasks 对应的结果"""
+    # 每个周期一块共享内存：第 0 行收盘价，第 1 行溢价率
+    shms = {}
+    specs = {}
+    try:
+        for period, (close, premium) in arrays.items():
+            length = len(close)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, 2 * length * 8))
+            block = np.ndarray((2, length), dtype=np.float64, buffer=shm.buf)
+            block[0] = close
+            block[1] = premium
+            shms[period] = shm
+            specs[period] = (shm.name, length)
+
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(specs,)) as pool:
+            futures = [pool.submit(_run_chunk, *task, qty) for task in tasks]
+            return [future.result() for future in futures]
+    finally:
+        for shm in shms.values():
+            shm.close()
+            shm.unlink()
+
+
+def _main():
+    """python -m sweep：从 stdin 读取 (arrays, tasks, qty, workers)，结果以 pickle 写到 stdout"""
+    # 结果独占原来的 stdout，进程内 (含工作进程) 的其他输出改到 stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    arrays, tasks, qty, workers = pickle.load(sys.stdin.buffer)
+    with out:
+        pickle.dump(_run_pool(arrays, tasks, qty, workers), out)
+
+
+def build_grid(premium_thresholds, ma_windows, loss_cuts, periods):
+    """展开参数网格，返回 DataFrame (每行一组参数)"""
+    rows = list(itertools.product(periods, premium_thresholds, ma_windows, loss_cuts))
+    return pd.DataFrame(rows, columns=["period", "premium_threshold", "ma_window", "loss_cut"])
+
+
+def run_sweep(histories, premium_thresholds, ma_windows, loss_cuts, qty=100, workers=None, top=None):
+    """在进程池中并行回测整个网格，按累计收益率 (其次最大回撤) 排名
+
+    histories: {周期: backtest.prepare_history 的结果}，周期为 weekly / daily。
+    """
+    grid = build_grid(premium_thresholds, ma_windows, loss_cuts, list(histories))
+    workers = workers or os.cpu_count() or 1
+    arrays = {period: (np.asarray(data["close"], dtype=np.float64), np.asarray(data["premium"], dtype=np.float64))
+              for period, data in histories.items()}
+    tasks = []
+    for period, group in grid.groupby("period", sort=False):
+        for start in range(0, len(group), CHUNK_SIZE):
+            chunk = group.iloc[start:start + CHUNK_SIZE]
+            tasks.append((chunk.index, (
+                period,
+                chunk["premium_threshold"].to_numpy(),
+                chunk["ma_window"].to_numpy(),
+                chunk["loss_cut"].to_numpy(),
+            )))
+
+    # 进程池放在独立的 python -m sweep 子进程中：spawn 出的工作进程会重新执行父进程的 __main__，
+    # 在 Streamlit 中那是 app.py (而 __main__ 又随每个会话的重跑被替换)；子进程的 __main__ 是本模块
+    proc = subprocess.run(
+        [sys.executable, "-m", "sweep"],
+        input=pickle.dumps((arrays, [task for _, task in tasks], qty, workers)),
+        capture_output=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"参数扫描子进程失败 (退出码 {proc.returncode}): {proc.stderr.decode(errors='replace')[-2000:]}")
+    for (index, _), chunk_result in zip(tasks, pickle.loads(proc.stdout)):
+        for key, values in chunk_result.items():
+            grid.loc[index, key] = values
+
+    result = pd.DataFrame({
+        "周期": grid["period"].map(PERIOD_LABELS).fillna(grid["period"]),
+        "溢价阈值%": grid["premium_threshold"],
+        "均线窗口": grid["ma_window"].astype(int),
+        "止损%": grid["loss_cut"],
+        "交易次数": grid["trades"].astype(int),
+        "胜率%": grid["hit_rate"] * 100,
+        "累计收益率%": grid["total_return_pct"],
+        "总盈亏(元)": grid["pnl"],
+        "最大回撤(元)": grid["max_drawdown"],
+        "持仓时间占比%": grid["exposure"] * 100,
+    })
+    result = result.sort_values(["累计收益率%", "最大回撤(元)"], ascending=[False, True]).reset_index(drop=True)
+    return result.head(top) if top else result
+
+
+if __name__ == "__main__":
+    _main()
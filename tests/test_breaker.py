@@ -0,0 +1,84 @@
+"""熔断器回归测试：被取消的半开探测请求不能让熔断器永久卡在 half_open
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import time
+import unittest
+
+os.environ.setdefault("ETF_SPAN_LOG", "")
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_breaker  # noqa: E402
+from mock_upstream import FaultConfig, start_mock_upstream  # noqa: E402
+from net import AsyncHTTPClient, set_upstream_base  # noqa: E402
+
+HOST = "push2.eastmoney.com"
+URL = f"https://{HOST}/api/qt/stock/get"
+PARAMS = {"secid": "0.159941", "fields": "f43"}
+
+
+class ProbeTimeoutTest(unittest.TestCase):
+    def test_lost_probe_is_released_after_reset_timeout(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        time.sleep(0.06)
+        breaker.before_request()          # 放行探测请求，但之后既不成功也不失败
+        self.assertEqual(breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+        time.sleep(0.06)
+        breaker.before_request()          # 探测超时视为丢失，重新放行
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_abandon_releases_probe(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        breaker.before_request()
+        breaker.abandon()
+        breaker.before_request()          # 不必等待超时
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+
+class CancelledProbeTest(unittest.TestCase):
+    def setUp(self):
+        self.faults = FaultConfig(latency=1.0)
+        self.server = start_mock_upstream(faults=self.faults)
+        set_upstream_base(f"http://127.0.0.1:{self.server.server_address[1]}")
+        self.client = AsyncHTTPClient()
+
+    def tearDown(self):
+        set_upstream_base(None)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_cancelled_probe_does_not_block_host(self):
+        breaker = get_breaker(HOST)
+        # 冷却期已过的熔断状态：下一个请求就是半开探测
+        breaker.record_success()
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        breaker.opened_at -= breaker.reset_timeout
+
+        async def cancel_probe():
+            task = asyncio.ensure_future(self.client.get(URL, params=PARAMS, timeout=5))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.client.run(cancel_probe(), timeout=10)
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+        self.faults.update({"latency": 0})
+        for _ in range(3):
+            r = self.client.run(self.client.get(URL, params=PARAMS, timeout=5), timeout=10)
+            self.assertEqual(r.status_code, 200)
+        self.assertEqual(breaker.state, CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+"""缓存的并发行为：single-flight 合并并发抓取、过期后后台刷新 (SWR)、刷新失败保留旧值
+
+    python -m unittest discover tests
+"""
+import io
+import os
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+
+os.environ.setdefault("ETF_SPAN_LOG", "")
+
+from cache import single_flight, swr_cache  # noqa: E402
+
+CALLERS = 8
+WAIT = 5   # 等待线程的超时 (秒)，正常情况下远用不到
+
+
+def run_concurrently(target, n=CALLERS):
+    """n 个线程同时调用 target()，返回各线程的结果 (异常作为结果返回)"""
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(WAIT)
+    return results
+
+
+class BlockingFunc:
+    """调用后阻塞到 release()，记录被调用的次数"""
+
+    def __init__(self, value=None, error=None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self._release = threading.Event()
+
+    def release(self):
+        self._release.set()
+
+    def reset(self):
+        """下一次调用重新阻塞"""
+        self.started.clear()
+        self._release.clear()
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.started.set()
+        self._release.wait(WAIT)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        func = BlockingFunc(value={"price": 1.0})
+        threading.Timer(0.1, func.release).start()
+        results = run_concurrently(lambda: single_flight(("test", "share"), func))
+        self.assertEqual(func.calls, 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_concurrent_callers_share_the_exception(self):
+        error = RuntimeError("upstream down")
+        func = BlockingFunc(error=error)
+        threading.Timer(0.1, func.release).start()
+        results = run_concurrently(lambda: single_flight(("test", "error"), func))
+        self.assertEqual(func.calls, 1)
+        self.assertTrue(all(r is error for r in results))
+
+    def test_cold_cache_misses_fetch_once(self):
+        func = BlockingFunc(value=2.5)
+        cached = swr_cache(ttl=60, default=float)(lambda code: func(code))
+        threading.Timer(0.1, func.release).start()
+        results = run_concurrently(lambda: cached("159941"))
+        self.assertEqual(func.calls, 1)
+        self.assertEqual(results, [2.5] * CALLERS)
+        cached.clear()
+
+
+class StaleWhileRevalidateTest(unittest.TestCase):
+    def test_stale_entry_returns_immediately_and_refreshes_once(self):
+        values = iter([1.0, 2.0])
+        func = BlockingFunc()
+
+        def fetch(code):
+            func.value = next(values)
+            return func(code)
+
+        cached = swr_cache(ttl=0.05, default=float)(fetch)
+        func.release()
+        self.assertEqual(cached("159941"), 1.0)
+
+        time.sleep(0.1)
+        func.reset()
+        start = time.monotonic()
+        results = run_concurrently(lambda: cached("159941"))
+        # 过期期间所有调用者立即拿到旧值，不等待后台刷新
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(results, [1.0] * CALLERS)
+        self.assertTrue(func.started.wait(WAIT))
+        self.assertEqual(func.calls, 2)
+
+        func.release()
+        deadline = time.monotonic() + WAIT
+        while cached.peek("159941").value != 2.0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(cached.peek("159941").value, 2.0)
+        self.assertEqual(func.calls, 2)
+        cached.clear()
+
+    def test_failed_refresh_keeps_last_good_value(self):
+        outcomes = iter([3.0, RuntimeError("timeout"), 0.0])
+
+        def fetch(code):
+            outcome = next(outcomes)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        cached = swr_cache(ttl=60, default=float)(fetch)
+        self.assertEqual(cached("159941"), 3.0)
+        with redirect_stdout(io.StringIO()):
+            entry = cached.refresh("159941")        # 抛出异常
+        self.assertEqual(entry.value, 3.0)
+        entry = cached.refresh("159941")            # 抓取函数吞掉异常后返回默认值
+        self.assertEqual(entry.value, 3.0)
+        self.assertEqual(cached("159941"), 3.0)
+        cached.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
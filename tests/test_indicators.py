@@ -0,0 +1,119 @@
+"""增量移动平均与 pandas rolling(window).mean() 的一致性
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from indicators import RESUM_INTERVAL, MovingAverageSeries
+
+WINDOW = 20
+RTOL = 2e-15   # 与 rolling 的相对误差上限 (增量求和的舍入误差)
+
+
+def weekly(n, seed=0):
+    """n 周的日期 (YYYY-MM-DD，每周五) 与随机游走收盘价"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end="2025-08-29", periods=n, freq="W-FRI").strftime("%Y-%m-%d").tolist()
+    closes = (1.0 + np.cumsum(rng.normal(0.002, 0.03, n))).clip(0.1).round(3)
+    return dates, closes
+
+
+def reference(closes):
+    return pd.Series(closes, dtype=np.float64).rolling(WINDOW).mean().to_numpy()
+
+
+def build(dates, closes):
+    series = MovingAverageSeries((WINDOW,))
+    for date, close in zip(dates, closes):
+        series.update(date, close)
+    return series
+
+
+class MovingAverageSeriesTest(unittest.TestCase):
+    def assertMatchesRolling(self, series, closes):
+        np.testing.assert_allclose(series.array(WINDOW), reference(closes), rtol=RTOL, atol=0)
+
+    def test_append_matches_rolling(self):
+        # 超过 RESUM_INTERVAL 次更新，覆盖定期重新求和
+        dates, closes = weekly(RESUM_INTERVAL + 300)
+        self.assertMatchesRolling(build(dates, closes), closes)
+
+    def test_update_in_progress_week(self):
+        dates, closes = weekly(60)
+        series = build(dates, closes)
+        closes = closes.copy()
+        for price in (1.5, 0.8, 1.234):
+            series.update(dates[-1], price)
+            closes[-1] = price
+            self.assertEqual(len(series), 60)
+            self.assertMatchesRolling(series, closes)
+
+    def test_earlier_date_is_rejected(self):
+        dates, closes = weekly(30)
+        series = build(dates, closes)
+        with self.assertRaises(ValueError):
+            series.update(dates[-2], 1.0)
+
+    def test_sync_replaces_last_week_when_its_date_moves_forward(self):
+        dates, closes = weekly(60)
+        # 同步时本周只到周三，之后周线日期变为周五且收盘价变化
+        midweek = dates[:-1] + [(pd.Timestamp(dates[-1]) - pd.Timedelta(days=2)).strftime("%Y-%m-%d")]
+        series = build(midweek, np.append(closes[:-1], 1.111))
+        self.assertTrue(series.sync(dates, closes))
+        self.assertEqual(series.dates, dates)
+        self.assertMatchesRolling(series, closes)
+
+    def test_sync_appends_new_weeks(self):
+        dates, closes = weekly(80)
+        series = build(dates[:50], closes[:50])
+        self.assertTrue(series.sync(dates, closes))
+        self.assertEqual(len(series), 80)
+        self.assertMatchesRolling(series, closes)
+
+    def test_nan_close(self):
+        dates, closes = weekly(80)
+        closes = closes.copy()
+        closes[30] = np.nan
+        series = build(dates, closes)
+        expected = reference(closes)
+        self.assertTrue(np.isnan(series.array(WINDOW)[30:50]).all())
+        self.assertFalse(np.isnan(series.array(WINDOW)[50:]).any())
+        np.testing.assert_allclose(series.array(WINDOW), expected, rtol=RTOL, atol=0)
+
+    def test_sync_returns_false_after_history_is_rebuilt(self):
+        dates, closes = weekly(60)
+        series = build(dates[:40], closes[:40])
+        # 更早的历史被补齐：首个日期变化
+        earlier, earlier_closes = weekly(70)
+        self.assertFalse(series.sync(earlier, earlier_closes))
+        # 中间某周的日期不一致
+        changed = list(dates)
+        changed[38] = "2000-01-01"
+        self.assertFalse(series.sync(changed, closes))
+        # 比已有数据更短
+        self.assertFalse(series.sync(dates[:10], closes[:10]))
+
+    def test_projected_matches_rolling(self):
+        dates, closes = weekly(60)
+        series = build(dates, closes)
+        price = 1.357
+        same = reference(np.append(closes[:-1], price))[-1]
+        new = reference(np.append(closes, price))[-1]
+        np.testing.assert_allclose(series.projected(price, same_period=True, window=WINDOW), same, rtol=RTOL)
+        np.testing.assert_allclose(series.projected(price, same_period=False, window=WINDOW), new, rtol=RTOL)
+        # 不修改状态
+        self.assertMatchesRolling(series, closes)
+
+    def test_projected_before_window_is_full(self):
+        dates, closes = weekly(WINDOW - 1)
+        series = build(dates, closes)
+        self.assertTrue(np.isnan(series.projected(1.0, same_period=True, window=WINDOW)))
+        np.testing.assert_allclose(series.projected(1.0, same_period=False, window=WINDOW),
+                                   reference(np.append(closes, 1.0))[-1], rtol=RTOL)
+
+
+if __name__ == "__main__":
+    unittest.main()
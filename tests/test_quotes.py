@@ -0,0 +1,55 @@
+"""报价源链回归测试：akshare 现货这类兜底源不参与对冲，只在其余源全部失败后才请求
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import unittest
+
+os.environ.setdefault("ETF_SPAN_LOG", "")
+
+from quotes import QuoteChain, QuoteProvider  # noqa: E402
+
+
+class FakeProvider(QuoteProvider):
+    def __init__(self, name, delay=0.0, price=None, fallback_only=False):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.price = price
+        self.fallback_only = fallback_only
+        self.calls = 0
+
+    async def fetch(self, client, code):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.price is None:
+            raise RuntimeError(f"{self.name} 失败")
+        return self.price
+
+
+class FallbackTest(unittest.TestCase):
+    def test_slow_sources_do_not_hedge_into_fallback(self):
+        direct = [FakeProvider(f"源{i}", delay=0.3, price=1.0 + i) for i in range(4)]
+        fallback = FakeProvider("兜底", price=9.0, fallback_only=True)
+        chain = QuoteChain(direct + [fallback], hedge_delay=0.02)
+        price, name = asyncio.run(chain.fetch(None, "159941"))
+        self.assertEqual((price, name), (1.0, "源0"))
+        self.assertEqual([p.calls for p in direct], [1, 1, 1, 1])
+        self.assertEqual(fallback.calls, 0)
+
+    def test_fallback_used_after_all_direct_sources_fail(self):
+        direct = [FakeProvider("慢失败", delay=0.1), FakeProvider("快失败")]
+        fallback = FakeProvider("兜底", price=9.0, fallback_only=True)
+        chain = QuoteChain(direct + [fallback], hedge_delay=0.02)
+        self.assertEqual(asyncio.run(chain.fetch(None, "159941")), (9.0, "兜底"))
+        self.assertEqual(fallback.calls, 1)
+
+    def test_all_failing_raises_last_error(self):
+        chain = QuoteChain([FakeProvider("失败"), FakeProvider("兜底失败", fallback_only=True)], hedge_delay=0.02)
+        with self.assertRaisesRegex(RuntimeError, "兜底失败"):
+            asyncio.run(chain.fetch(None, "159941"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+"""分阶段耗时埋点 (span)
+
+为上游请求、缓存读取、解析、分析与渲染记录耗时、字节数、重试次数与结果：
+最近的记录保存在进程内的环形缓冲区，供页面调试面板展示；
+设置 ETF_SPAN_LOG (如 .data/spans.jsonl) 时另外逐条写入 JSON Lines 日志 (默认不写)，
+一次刷新慢在 fundgz、push2、akshare 还是渲染，一目了然。
+"""
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+import pandas as pd
+
+SPAN_BUFFER = 2000              # 内存中保留最近多少条记录
+LOG_PATH = os.environ.get("ETF_SPAN_LOG") or None
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+_spans = deque(maxlen=SPAN_BUFFER)
+_lock = threading.Lock()
+_local = threading.local()
+_logger = None
+_ids = itertools.count(1)
+_listeners = []
+
+
+class Span:
+    """一个阶段的记录；在 with span(...) as s 内可补充 bytes / retries / 结果"""
+
+    def __init__(self, name, attrs, parent=None):
+        self.name = name
+        self.attrs = attrs
+        self.id = next(_ids)
+        self.parent = parent.id if parent is not None else None
+        self.ts = time.time()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.outcome = "ok"
+        self.bytes = None
+        self.retries = 0
+        self.error = None
+        self.thread = threading.current_thread().name
+
+    def fail(self, error):
+        self.outcome = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self):
+        return {
+            "ts": round(self.ts, 3),
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "duration_ms": round(self.duration * 1000, 3),
+            "outcome": self.outcome,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "error": self.error,
+            "thread": self.thread,
+            "attrs": self.attrs,
+        }
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        _logger = logging.getLogger("etf.spans")
+        _logger.propagate = False
+        _logger.setLevel(logging.INFO)
+        if LOG_PATH:
+            os.makedirs(os.path.dirname(os.path.abspath(LOG_PATH)), exist_ok=True)
+            handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger.addHandler(handler)
+    return _logger
+
+
+def add_listener(callback):
+    """注册回调 callback(span)，每条记录完成时调用 (如指标汇总)"""
+    with _lock:
+        _listeners.append(callback)
+
+
+def _record(s):
+    with _lock:
+        _spans.append(s)
+        logger = _get_logger()
+        listeners = list(_listeners)
+    if logger.handlers:
+        logger.info(json.dumps(s.to_dict(), ensure_ascii=False, default=str))
+    for callback in listeners:
+        try:
+            callback(s)
+        except Exception as e:
+            print(f"Span Listener Error: {e}")
+
+
+@contextmanager
+def span(name, **attrs):
+    """记录 with 块的耗时；块内抛出的异常记为 error 并继续抛出。同一线程内的 span 按嵌套关系记录父级"""
+    stack = _stack()
+    s = Span(name, attrs, stack[-1] if stack else None)
+    stack.append(s)
+    try:
+        yield s
+    except Exception as e:
+        s.fail(e)
+        raise
+    finally:
+        s.duration = time.perf_counter() - s.start
+        stack.pop()
+        _record(s)
+
+
+@contextmanager
+def detached_span(name, **attrs):
+    """不参与线程内嵌套的 span，用于同一事件循环线程中并发执行的协程"""
+    s = Span(name, attrs)
+    try:
+        yield s
+    except Exception as e:
+        s.fail(e)
+        raise
+    finally:
+        s.duration = time.perf_counter() - s.start
+        _record(s)
+
+
+def event(name, outcome, **attrs):
+    """记录一个瞬时事件 (如缓存命中/未命中)，耗时为 0"""
+    s = Span(name, attrs, current_span())
+    s.outcome = outcome
+    _record(s)
+
+
+def note_error(error):
+    """把被调用方吞掉的异常记到当前线程正在进行的 span 上 (抓取函数失败时只返回默认值)"""
+    stack = _stack()
+    if stack:
+        stack[-1].fail(error)
+
+
+def current_span():
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def recent_spans(limit=200):
+    """最近的记录 (新的在前)，每条为 dict"""
+    with _lock:
+        spans = list(_spans)[-limit:]
+    return [s.to_dict() for s in reversed(spans)]
+
+
+def span_summary():
+    """按阶段名称汇总：次数、失败数、平均/P95/最大耗时 (毫秒)"""
+    with _lock:
+        spans = list(_spans)
+    if not spans:
+        return pd.DataFrame()
+    df = pd.DataFrame({
+        "阶段": [s.name for s in spans],
+        "耗时": [s.duration * 1000 for s in spans],
+        "失败": [s.outcome == "error" for s in spans],
+    })
+    grouped = df.groupby("阶段")
+    return pd.DataFrame({
+        "次数": grouped.size(),
+        "失败": grouped["失败"].sum(),
+        "平均(ms)": grouped["耗时"].mean(),
+        "P95(ms)": grouped["耗时"].quantile(0.95),
+        "最大(ms)": grouped["耗时"].max(),
+    }).sort_values("最大(ms)", ascending=False).reset_index()